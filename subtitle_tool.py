@@ -5,22 +5,123 @@
 Fix subtitles srt
 """
 import argparse
+from array import array
+import asyncio
+import bisect
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+import contextlib
 import difflib
+import fnmatch
+from functools import lru_cache
+from itertools import repeat
+import gc
+import gzip
+import hashlib
+import heapq
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import importlib.util
+import io
+import json
+import multiprocessing
 import os
+import queue
 import re
-import subprocess
+import socket
+import socketserver
 import sys
-from pathlib import Path
+import tarfile
+import threading
+import time
+import zipfile
+from pathlib import Path, PurePosixPath
+from urllib.parse import parse_qs, urlparse
 import unicodedata
 import pysubs2
 from chardet import detect
-from bs4 import BeautifulSoup
+from lxml import etree
 from opencc import OpenCC
 import dictionary
 
+try:
+    import py7zr
+except ImportError:
+    py7zr = None
 
-SUBTITLE_FORMAT = ['.srt', '.ass', '.ssa', '.vtt', '.xml']
-ARCHIVE_FORMAT = ['.7z,', '.gz', '.rar', '.tar', '.zip']
+try:
+    import rarfile
+except ImportError:
+    rarfile = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+SUBTITLE_FORMAT = ['.srt', '.ass', '.ssa', '.vtt', '.xml', '.ttml', '.dfxp']
+ARCHIVE_FORMAT = ['.7z', '.gz', '.rar', '.tar', '.tgz', '.zip']
+ARCHIVE_SUFFIX = re.compile(r'(\.tar)?\.(7z|gz|rar|tar|tgz|zip)$', re.I)
+
+# 打包字幕：壓縮等級、固定的檔案時間讓同樣的字幕打包出同樣的 zip
+ZIP_COMPRESS_LEVEL = 6
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+# 動態字幕合併：比對最近幾行、可容許的時間間隔（毫秒）
+COALESCE_WINDOW = 32
+COALESCE_GAP = 50
+COALESCE_FRAGMENT = 100
+OVERRIDE_TAGS = re.compile(r'\{.*?\}')
+ANIMATION_TAGS = re.compile(r'\\(?:move|t\(|[kK][fo]?\d)')
+
+# 串流處理 srt：排序時最多暫存幾行
+STREAM_SORT_WINDOW = 256
+
+# 合併字幕：未指定起始時間時，下一段接在前一段結束後幾毫秒
+MERGE_GAP = 5000
+
+# 雙語字幕：配對所需的最少重疊（占較短一行的比例）、排版、未配對字幕的處理、中文語言標籤
+BILINGUAL_MIN_OVERLAP = 0.3
+BILINGUAL_LAYOUTS = ['zh-en', 'en-zh', 'split']
+BILINGUAL_UNMATCHED = ['keep', 'zh', 'drop']
+BILINGUAL_LANGUAGE = re.compile(r'\.(?:zh|chi|chs|cht)(?:[-_]\w+)?$', re.I)
+
+# 增量處理：記錄每個資料夾已處理檔案的 manifest
+MANIFEST_NAME = '.subtitle_tool.json'
+
+# 監看資料夾：輪詢間隔、檔案需靜止多久才視為寫入完成（秒）
+WATCH_INTERVAL = 2
+WATCH_SETTLE = 1
+
+# 字幕服務：等待佇列上限、每批最多幾個請求、湊批等待時間與請求逾時（秒）
+SERVICE_PORT = 8000
+SERVICE_QUEUE_SIZE = 256
+SERVICE_BATCH_SIZE = 16
+SERVICE_BATCH_WAIT = 0.01
+SERVICE_TIMEOUT = 120
+
+# 預熱用字幕：fork 前先跑一遍修正流程，涵蓋標籤、標點、重疊、簡體與 vtt 位置
+WARMUP_SRT = ('1\n00:00:01,000 --> 00:00:02,000\n{\\an8}<i>你好,世界!</i>\n\n'
+              '2\n00:00:01,000 --> 00:00:02,000\n- 你呢 -我嗎？\n\n'
+              '3\n00:00:01,500 --> 00:00:03,000\n（旁白）一付模樣...\n\n'
+              '4\n00:00:04,000 --> 00:00:05,000\n{\\pos(10,20)}标题 Caption\n\n')
+WARMUP_VTT = ('WEBVTT\n\n00:00:01.000 --> 00:00:02.000 line:10%\n他說（你好）\n\n'
+              '00:00:03.000 --> 00:00:04.000\n<i>世界</i>\n')
+
+# 字典索引：記錄哪些檔案、哪幾行含有字典的字詞
+INDEX_NAME = '.subtitle_index.json'
+RULE_TABLES = ('CONTEXT', 'TYPO')
+
+# HLS WebVTT 分段字幕：跨分段重複字幕的比對行數、MPEG-TS 時脈
+SEGMENT_WINDOW = 8
+MPEGTS_CLOCK = 90
+MPEGTS_ROLLOVER = 2 ** 33
+
+
+@lru_cache(maxsize=None)
+def get_opencc():
+    """Load OpenCC Simplified to Taiwan Traditional Chinese converter once"""
+    return OpenCC('s2tw.json')
 
 
 def get_encoding_type(source):
@@ -99,90 +200,670 @@ def convert_utf8(srcfile):
         print('Encode Error')
 
 
+def replace_file(file_name, data):
+    """Write data to a .part file, then replace file_name with it"""
+    temp_file = file_name + '.part'
+    Path(temp_file).write_bytes(data)
+    os.replace(temp_file, file_name)
+
+
+
+SHIFT_TIMESTAMP = re.compile(rb'(?:(\d+):)?(\d{1,2}):(\d{2})([,.])(\d{1,3})')
+SHIFT_SRT_TIMING = re.compile(rb'^([ \t]*)((?:\d+:)?\d{1,2}:\d{2}[,.]\d{1,3})([ \t]*-->[ \t]*)'
+                              rb'((?:\d+:)?\d{1,2}:\d{2}[,.]\d{1,3})', re.M)
+SHIFT_ASS_TIMING = re.compile(rb'^((?:Dialogue|Comment):[^,\n]*,[ \t]*)(\d+:\d{2}:\d{2}\.\d{2})(,[ \t]*)'
+                              rb'(\d+:\d{2}:\d{2}\.\d{2})', re.M)
+SHIFT_FORMATS = {'.srt': SHIFT_SRT_TIMING, '.vtt': SHIFT_SRT_TIMING,
+                 '.ass': SHIFT_ASS_TIMING, '.ssa': SHIFT_ASS_TIMING}
+
+# 重新計時：NTSC 影格率的精確值
+FRAMERATES = {'23.976': 24000 / 1001, '29.97': 30000 / 1001, '59.94': 60000 / 1001}
+
+# 自動校正時間：取樣間隔（毫秒）、偵測漂移時的粗取樣倍數、最大搜尋偏移（秒）、漂移時嘗試的影格率互轉
+SYNC_RESOLUTION = 10
+SYNC_COARSE = 10
+SYNC_MAX_OFFSET = 600
+SYNC_FRAMERATES = ['23.976', '24', '25']
+EPISODE = re.compile(r'S\d+E\d+', re.I)
+
+
+def timestamp_bytes_to_ms(stamp):
+    """Convert srt/vtt/ass timestamp bytes to ms"""
+    hours, minutes, seconds, _, fraction = SHIFT_TIMESTAMP.fullmatch(stamp).groups()
+    return ((int(hours or 0) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + \
+        int(fraction) * 10 ** (3 - len(fraction))
 
-def shift_subtitle(file_name, offset):
+
+def shift_timestamp_bytes(stamp, offset):
+    """Shift timestamp bytes by offset ms, keep its separator and digit widths"""
+    return format_timestamp_bytes(stamp, timestamp_bytes_to_ms(stamp) + offset)
+
+
+def format_timestamp_bytes(stamp, ms):
+    """Format ms like timestamp bytes stamp, keep its separator and digit widths"""
+    hours, minutes, _, separator, fraction = SHIFT_TIMESTAMP.fullmatch(stamp).groups()
+    ms = max(ms, 0)
+    scale = 10 ** (3 - len(fraction))
+    ms = (ms + scale // 2) // scale
+    ms, frac = divmod(ms, 1000 // scale)
+    ms, second = divmod(ms, 60)
+    hour, minute = divmod(ms, 60)
+    if hours is None and hour == 0:
+        text = f'{minute:0{len(minutes)}d}:{second:02d}'
+    else:
+        text = f'{hour:0{len(hours or b"00")}d}:{minute:0{len(minutes)}d}:{second:02d}'
+    return text.encode('ascii') + separator + f'{frac:0{len(fraction)}d}'.encode('ascii')
+
+
+def shift_timestamps(data, pattern, offset, after=None):
     """
-    Shift subtitle
+    Shift start and end of timing lines matched by pattern, copy every other
+    byte unchanged, only shift events starting at or after `after` ms if given,
+    return shifted data and number of shifted events
     """
-    print('\n字幕平移：' + str(offset) + ' 秒\n')
-    subs = pysubs2.load(file_name)
-    subs.shift(s=offset)
-    subs.save(file_name)
+    count = 0
+
+    def shift(match):
+        nonlocal count
+        prefix, start, separator, end = match.groups()
+        if after is not None and timestamp_bytes_to_ms(start) < after:
+            return match.group(0)
+        count += 1
+        return prefix + shift_timestamp_bytes(start, offset) + separator + shift_timestamp_bytes(end, offset)
+
+    return pattern.sub(shift, data), count
+
 
+def parse_time_arg(value):
+    """Convert seconds or [HH:]MM:SS[.mmm] of command line to ms"""
+    seconds = 0.0
+    for part in value.replace(',', '.').split(':'):
+        seconds = seconds * 60 + float(part)
+    return int(round(seconds * 1000))
 
-def merge_subtitle(first_file, second_file):
+
+def write_ttml_events(file_name, events):
     """
-    Merge subtitle
+    Write events of xml/ttml/dfxp as ttml, ttml/dfxp in place and xml to
+    a .ttml file beside it, return the written file name
     """
-    print('\n合併字幕：' + os.path.basename(first_file) + ' 和 ' + os.path.basename(second_file) +
-          '\n---------------------------------------------------------------')
-    subs_first = pysubs2.load(first_file)
-    subs_second = pysubs2.load(second_file)
-    delta = 5000
-    offset = pysubs2.time.make_time(s=(subs_first[-1].end + delta)/1000)
-    for sub in subs_second:
-        subs_first.insert(-1, pysubs2.ssaevent.SSAEvent(start=sub.start +
-                                                        offset, end=sub.end+offset, text=sub.text))
-
-    new_file_name = first_file.replace('.srt', '-merge.srt')
-    episode = re.search(r'(.+?S\d+E)(\d+)(.*?\.srt)', new_file_name)
+    output_file = file_name
+    if Path(file_name).suffix.lower() == '.xml':
+        # 不能寫回 <dia> 格式，另存 ttml，不覆寫原始檔
+        output_file = os.path.splitext(file_name)[0] + '.ttml'
+    replace_file(output_file, dump_ttml(events).encode('utf-8'))
+    return output_file
+
+
+def shift_subtitle(file_name, offset, after=None):
+    """
+    Shift subtitle, srt/vtt/ass only rewrite timestamps and keep every other byte,
+    ttml/dfxp are rewritten as ttml and xml is written to a .ttml file beside it,
+    only shift events starting at or after `after` ms if given
+    """
+    print('\n字幕平移：' + str(offset) + ' 秒' +
+          ('（' + pysubs2.subrip.SubripFormat.ms_to_timestamp(after) + ' 之後）' if after is not None else '') + '\n')
+    offset_ms = int(round(offset * 1000))
+    pattern = SHIFT_FORMATS.get(Path(file_name).suffix.lower())
+    if pattern:
+        data, count = shift_timestamps(Path(file_name).read_bytes(), pattern, offset_ms, after)
+        replace_file(file_name, data)
+        print(os.path.basename(file_name) + '\t平移 ' + str(count) + ' 行\n')
+        return file_name
+
+    events = [sub for sub in load_subtitle(file_name) if not sub.is_comment]
+    count = 0
+    for sub in events:
+        if after is None or sub.start >= after:
+            sub.shift(ms=offset_ms)
+            count += 1
+    output_file = write_ttml_events(file_name, events)
+    print(os.path.basename(output_file) + '\t平移 ' + str(count) + ' 行\n')
+    return output_file
+
+
+def parse_framerate(value):
+    """Convert framerate of command line to fps, 23.976 or 24000/1001"""
+    if '/' in value:
+        numerator, denominator = value.split('/')
+        return float(numerator) / float(denominator)
+    return FRAMERATES.get(value, float(value))
+
+
+def fps_retime(source_fps, target_fps):
+    """Retime map of framerate conversion, e.g. 23.976 to 25 speeds up"""
+    return [(0, source_fps / target_fps, 0.0)]
+
+
+def linear_retime(first, second):
+    """Retime map of two (old ms, new ms) sync points"""
+    (old_first, new_first), (old_second, new_second) = first, second
+    if old_first == old_second:
+        raise ValueError('兩個同步點的時間不可相同')
+    scale = (new_second - new_first) / (old_second - old_first)
+    return [(0, scale, new_first - old_first * scale)]
+
+
+def piecewise_retime(points):
+    """Retime map of (from ms, offset ms), each offset applies until next point"""
+    return [(start, 1.0, offset) for start, offset in sorted(points)]
+
+
+def retime_columns(starts, ends, retime_map):
+    """
+    Retime start and end columns of array('i') by a retime map of
+    (from ms, scale, offset ms): events starting from `from` ms until the next
+    one become start * scale + offset, events before the first are unchanged.
+    Both times of an event use the segment of its start so it moves as a whole.
+    """
+    bounds = [start for start, _, _ in retime_map]
+    scales = [1.0] + [scale for _, scale, _ in retime_map]
+    offsets = [0.0] + [offset for _, _, offset in retime_map]
+    if np is not None:
+        starts = np.frombuffer(starts, dtype=np.intc) if len(starts) else np.zeros(0, dtype=np.intc)
+        ends = np.frombuffer(ends, dtype=np.intc) if len(ends) else np.zeros(0, dtype=np.intc)
+        segment = np.searchsorted(bounds, starts, side='right')
+        scale, offset = np.asarray(scales)[segment], np.asarray(offsets)[segment]
+        return tuple(array('i', np.maximum(np.rint(column * scale + offset), 0).astype(np.intc).tobytes())
+                     for column in (starts, ends))
+
+    segments = [bisect.bisect_right(bounds, start) for start in starts]
+    return tuple(array('i', [max(round(time * scales[i] + offsets[i]), 0) for time, i in zip(column, segments)])
+                 for column in (starts, ends))
+
+
+def retime_timestamps(data, pattern, retime_map):
+    """
+    Retime timing lines matched by pattern in one vectorized step,
+    copy every other byte unchanged, return retimed data and number of events
+    """
+    matches = list(pattern.finditer(data))
+    starts, ends = retime_columns(array('i', [timestamp_bytes_to_ms(match.group(2)) for match in matches]),
+                                  array('i', [timestamp_bytes_to_ms(match.group(4)) for match in matches]),
+                                  retime_map)
+    pieces = []
+    position = 0
+    for match, start, end in zip(matches, starts, ends):
+        prefix, start_stamp, separator, end_stamp = match.groups()
+        pieces += [data[position:match.start()], prefix, format_timestamp_bytes(start_stamp, start),
+                   separator, format_timestamp_bytes(end_stamp, end)]
+        position = match.end()
+    pieces.append(data[position:])
+    return b''.join(pieces), len(matches)
+
+
+def get_retime_map(args):
+    """Get retime map of --fps, --sync and --offsets, None if not given"""
+    retime_map = None
+    if args.fps:
+        source, target = args.fps.split(':')
+        retime_map = fps_retime(parse_framerate(source), parse_framerate(target))
+    elif args.sync:
+        points = [[parse_time_arg(time) for time in point.split('=')] for point in args.sync.split(',')]
+        if len(points) != 2:
+            print('同步點需為兩組，如：00:01:00=00:01:02,01:00:00=01:00:30\n')
+            sys.exit()
+        retime_map = linear_retime(*points)
+    elif args.offsets:
+        retime_map = piecewise_retime([(parse_time_arg(point.split('=')[0]), float(point.split('=')[1]) * 1000)
+                                       for point in args.offsets.split(',')])
+    return retime_map
+
+
+def format_retime_map(retime_map):
+    """Format retime map for console"""
+    return '\n'.join(pysubs2.subrip.SubripFormat.ms_to_timestamp(start) + ' 起：×' + f'{scale:.6g}' +
+                     ' ' + f'{offset / 1000:+.3f}' + ' 秒' for start, scale, offset in retime_map)
+
+
+def retime_subtitle(file_name, retime_map):
+    """
+    Retime subtitle by a retime map, srt/vtt/ass only rewrite timestamps
+    and keep every other byte, ttml/dfxp are rewritten as ttml and xml is
+    written to a .ttml file beside it
+    """
+    print('\n字幕重新計時：\n' + format_retime_map(retime_map) + '\n')
+    pattern = SHIFT_FORMATS.get(Path(file_name).suffix.lower())
+    if pattern:
+        data, count = retime_timestamps(Path(file_name).read_bytes(), pattern, retime_map)
+        replace_file(file_name, data)
+        print(os.path.basename(file_name) + '\t重新計時 ' + str(count) + ' 行\n')
+        return file_name
+
+    events = retime_events([sub for sub in load_subtitle(file_name) if not sub.is_comment], retime_map)
+    output_file = write_ttml_events(file_name, events)
+    print(os.path.basename(output_file) + '\t重新計時 ' + str(len(events)) + ' 行\n')
+    return output_file
+
+
+def retime_events(events, retime_map):
+    """Retime list of SSAEvent in place"""
+    starts, ends = retime_columns(array('i', [sub.start for sub in events]),
+                                  array('i', [sub.end for sub in events]), retime_map)
+    for sub, start, end in zip(events, starts, ends):
+        sub.start, sub.end = start, end
+    return events
+
+
+def speech_signal(starts, ends, length, resolution=SYNC_RESOLUTION):
+    """Rasterize events into a speech activity signal of `length` samples"""
+    activity = np.zeros(length + 1, dtype=np.int32)
+    np.add.at(activity, np.clip(starts // resolution, 0, length), 1)
+    np.add.at(activity, np.clip(ends // resolution, 0, length), -1)
+    return (np.cumsum(activity[:-1]) > 0).astype(np.float64)
+
+
+def correlate_tracks(reference, target, scales, resolution, max_offset):
+    """
+    Cross-correlate speech activity of reference and target scaled by each
+    scale with FFT, return (scale, offset ms, match ratio) of the best one
+    """
+    target_starts = np.asarray(target.starts, dtype=np.float64)
+    target_ends = np.asarray(target.ends, dtype=np.float64)
+    reference_end = max(reference.ends) // resolution + 1
+    target_end = int(max(target.ends) * max(scales)) // resolution + 1
+    # 補零到兩段訊號總長，避免循環相關互相干擾
+    size = 1 << (reference_end + target_end).bit_length()
+    reference_signal = speech_signal(np.asarray(reference.starts), np.asarray(reference.ends), reference_end, resolution)
+    reference_spectrum = np.fft.rfft(reference_signal, size)
+    max_lag = min(max_offset * 1000 // resolution, size // 2 - 1)
+    lags = np.r_[0:max_lag + 1, -max_lag:0]
+
+    best = (1.0, 0.0, -1.0)
+    for scale in sorted(scales):
+        signal = speech_signal(np.rint(target_starts * scale).astype(np.int64),
+                               np.rint(target_ends * scale).astype(np.int64), target_end, resolution)
+        # correlation[lag] = sum(reference[i + lag] * signal[i])
+        correlation = np.fft.irfft(reference_spectrum * np.conj(np.fft.rfft(signal, size)), size)[lags]
+        index = int(np.argmax(correlation))
+        ratio = float(correlation[index] / max(np.sqrt(reference_signal.sum() * signal.sum()), 1.0))
+        if ratio > best[2]:
+            best = (scale, float(lags[index] * resolution), ratio)
+    return best
+
+
+def find_sync(reference, target, drift=False, resolution=SYNC_RESOLUTION, max_offset=SYNC_MAX_OFFSET):
+    """
+    Find retime map moving target track onto reference track by FFT
+    cross-correlation of their speech activity, also try framerate drifts
+    if drift, return (retime map, match ratio of speech activity)
+    """
+    scales = {1.0}
+    if drift:
+        rates = [parse_framerate(rate) for rate in SYNC_FRAMERATES]
+        scales |= {source / target for source in rates for target in rates}
+        # 先以粗取樣挑出漂移，再以原取樣求精確偏移
+        scale, _, _ = correlate_tracks(reference, target, scales, resolution * SYNC_COARSE, max_offset)
+        scales = {scale}
+    scale, offset, ratio = correlate_tracks(reference, target, scales, resolution, max_offset)
+    return [(0, scale, offset)], ratio
+
+
+def get_paired_subtitle(reference, subtitle):
+    """Get subtitle paired with subtitle, reference may be a folder matched by SxxEyy or file name"""
+    if not os.path.isdir(reference):
+        return reference
+    episode = EPISODE.search(os.path.basename(subtitle))
+    stem = Path(subtitle).stem
+    for entry in sorted(os.scandir(reference), key=lambda entry: entry.name):
+        if not entry.is_file() or Path(entry.name).suffix not in SUBTITLE_FORMAT or \
+                os.path.abspath(entry.path) == os.path.abspath(subtitle):
+            continue
+        match = EPISODE.search(entry.name)
+        if (episode and match and match.group(0).upper() == episode.group(0).upper()) or \
+                (not episode and Path(entry.name).stem == stem):
+            return entry.path
+    return None
+
+
+def load_decoded_track(file_name):
+    """Load sorted track of subtitle in any encoding"""
+    events = parse_subtitle_content(file_name, decode_subtitle(Path(file_name).read_bytes()))
+    return SubtitleTrack.from_events(events).sort()
+
+
+def auto_sync_subtitle(file_name, reference, drift=False):
+    """
+    Sync subtitle to a reference subtitle, apply the offset and drift
+    with retime, return file name or None if not synced
+    """
+    if np is None:
+        print("需安裝 numpy 才能自動校正時間\n")
+        return None
+    if reference is None:
+        print(os.path.basename(file_name) + " 找不到參考字幕\n")
+        return None
+
+    target = load_decoded_track(file_name)
+    reference_track = load_decoded_track(reference)
+    if not len(target) or not len(reference_track):
+        print(os.path.basename(file_name) + " 沒有可比對的字幕\n")
+        return None
+
+    retime_map, ratio = find_sync(reference_track, target, drift)
+    print('\n自動校正時間：參考 ' + os.path.basename(reference) +
+          '，吻合度 ' + f'{ratio:.1%}')
+    return retime_subtitle(file_name, retime_map)
+
+
+def get_merge_offsets(tracks, gap=MERGE_GAP):
+    """Offset of each part, which starts `gap` ms after every previous part ends"""
+    offsets = []
+    end = 0
+    for track in tracks:
+        offset = end + gap if offsets else 0
+        offsets.append(offset)
+        end = max(end, offset + max(track.ends, default=0))
+    return offsets
+
+
+def merge_tracks(tracks, offsets):
+    """
+    Merge sorted tracks shifted by offsets in one ordered pass with a heap,
+    yield (start, end, text), equal times keep the order of parts
+    """
+    parts = [zip(array('i', [start + offset for start in track.starts]),
+                 array('i', [end + offset for end in track.ends]),
+                 repeat(part), range(len(track)))
+             for part, (track, offset) in enumerate(zip(tracks, offsets))]
+    for start, end, part, index in heapq.merge(*parts):
+        yield start, end, tracks[part].texts[index]
+
+
+def get_merge_file_name(file_names):
+    """
+    Name merged file after the first part, SxxEyy of n parts is renumbered to
+    the episode they make up, e.g. S01E03 and S01E04 to S01E02
+    """
+    directory, name = os.path.split(file_names[0])
+    name = Path(name).stem + '-merge.srt'
+    episode = re.search(r'(S\d+E)(\d+)', name, re.I)
     if episode:
-        new_file_name = episode.group(
-            1) + str(int((int(episode.group(2))+1)/2)).zfill(2) + episode.group(3)
-    subs_first.save(new_file_name)
-    print(os.path.basename(new_file_name) + '\t...合併完成\n')
+        number = (int(episode.group(2)) - 1) // len(file_names) + 1
+        name = name[:episode.start(2)] + str(number).zfill(len(episode.group(2))) + name[episode.end(2):]
+    return os.path.join(directory, name)
+
+
+def merge_subtitle(file_names, offsets=None, new_file_name=None):
+    """
+    Merge subtitle parts into one srt, parts follow one another unless
+    offsets (ms) of every part after the first are given, write one event at a time
+    """
+    print('\n合併字幕：' + ' 和 '.join(os.path.basename(file_name) for file_name in file_names) +
+          '\n---------------------------------------------------------------')
+    tracks = [SubtitleTrack.load(file_name).sort() for file_name in file_names]
+    offsets = [0] + list(offsets) if offsets is not None else get_merge_offsets(tracks)
+
+    new_file_name = new_file_name or get_merge_file_name(file_names)
+    SSAEvent = pysubs2.ssaevent.SSAEvent
+    overlap = 0
+
+    def events():
+        nonlocal overlap
+        previous_end = None
+        for start, end, text in merge_tracks(tracks, offsets):
+            if previous_end is not None and (start < previous_end or end < previous_end):
+                overlap += 1
+            previous_end = end
+            yield SSAEvent(start=start, end=end, text=text)
+
+    with open(new_file_name, 'w', encoding='utf-8') as f:
+        write_srt_events(events(), f)
+    print(os.path.basename(new_file_name) + '\t...合併完成')
+    print("重疊行數：" + str(overlap) + '\n')
+    return new_file_name
+
+
+def align_tracks(primary, secondary, min_overlap=BILINGUAL_MIN_OVERLAP):
+    """
+    Align two tracks by time overlap, each secondary event goes to the
+    primary event it overlaps most, found with an interval index of the
+    secondary track so long events on either side stay O(log n + k), return
+    secondary indexes of each primary event and unmatched secondary indexes
+    """
+    owners = [-1] * len(secondary)
+    best = [0] * len(secondary)
+    index = secondary.index()
+    for position, (start, end) in enumerate(zip(primary.starts, primary.ends)):
+        for candidate in index.overlap(start, end):
+            other_start, other_end = secondary.starts[candidate], secondary.ends[candidate]
+            overlap = min(end, other_end) - max(start, other_start)
+            if overlap > best[candidate] and \
+                    overlap >= min_overlap * min(end - start, other_end - other_start):
+                best[candidate], owners[candidate] = overlap, position
+
+    groups = [[] for _ in range(len(primary))]
+    unmatched = []
+    for candidate, owner in enumerate(owners):
+        (groups[owner] if owner >= 0 else unmatched).append(candidate)
+    return groups, unmatched
+
+
+def get_bilingual_events(primary, secondary, output_format='srt', layout='zh-en', unmatched='keep'):
+    """
+    Combine aligned Chinese and English tracks into list of SSAEvent,
+    zh-en/en-zh stack both lines on the Chinese timing, split keeps
+    English on its own timing at the top, unmatched English is kept
+    with keep, unmatched Chinese is kept with keep or zh
+    """
+    SSAEvent = pysubs2.ssaevent.SSAEvent
+    groups, unmatched_secondary = align_tracks(primary, secondary)
+    ass = output_format == 'ass'
+
+    def english(start, end, text):
+        return SSAEvent(start=start, end=end, text=text, style='English')
+
+    events = []
+    for index, group in enumerate(groups):
+        start, end, text = primary.starts[index], primary.ends[index], primary.texts[index]
+        if not group:
+            if unmatched != 'drop':
+                events.append(SSAEvent(start=start, end=end, text=text))
+        elif layout == 'split':
+            events.append(SSAEvent(start=start, end=end, text=text))
+            events.extend(english(secondary.starts[k], secondary.ends[k], secondary.texts[k]) for k in group)
+        else:
+            lines = [(text, 'Default'), ('\\N'.join(secondary.texts[k] for k in group), 'English')]
+            if layout == 'en-zh':
+                lines.reverse()
+            (first_text, first_style), (second_text, second_style) = lines
+            separator = '\\N{\\r' + second_style + '}' if ass else '\\N'
+            events.append(SSAEvent(start=start, end=end, text=first_text + separator + second_text,
+                                   style=first_style))
+    if unmatched == 'keep':
+        events.extend(english(secondary.starts[k], secondary.ends[k], secondary.texts[k])
+                      for k in unmatched_secondary)
+    # 兩軌各自有序，timsort 合併近乎線性
+    events.sort(key=lambda sub: (sub.start, sub.end))
+    return events
+
+
+def dump_bilingual(events, output_format, layout):
+    """
+    Serialize bilingual events, ass has a smaller English style,
+    srt of split puts {\\an8} before English text
+    """
+    if output_format != 'ass':
+        if layout != 'split':
+            return dump_srt_events(events)
+        blocks = []
+        for sub in events:
+            block = dump_srt_event(sub, len(blocks) + 1)
+            if block is not None:
+                if sub.style == 'English':
+                    line_num, timing, text = block.split('\n', 2)
+                    block = line_num + '\n' + timing + '\n' + align_top(text)
+                blocks.append(block)
+        return ''.join(blocks)
+    subs = pysubs2.SSAFile()
+    subs.styles['English'] = pysubs2.SSAStyle(
+        fontsize=14, alignment=pysubs2.Alignment.TOP_CENTER if layout == 'split' else pysubs2.Alignment.BOTTOM_CENTER)
+    subs.events = events
+    return subs.to_string('ass')
+
+
+def bilingual_subtitle(file_name, english_file, output_format='srt', layout='zh-en', unmatched='keep'):
+    """Combine Chinese subtitle and English subtitle into one dual subtitle"""
+    if english_file is None:
+        print(os.path.basename(file_name) + " 找不到英文字幕\n")
+        return None
+    print('\n雙語字幕：' + os.path.basename(file_name) + ' 和 ' + os.path.basename(english_file) +
+          '\n---------------------------------------------------------------')
+    primary = load_decoded_track(file_name)
+    secondary = load_decoded_track(english_file)
+    events = get_bilingual_events(primary, secondary, output_format, layout, unmatched)
+
+    stem = BILINGUAL_LANGUAGE.sub('', Path(file_name).stem)
+    new_file_name = os.path.join(os.path.dirname(file_name), stem + '.zh-en.' + output_format)
+    with open(new_file_name, 'w', encoding='utf-8') as f:
+        f.write(dump_bilingual(events, output_format, layout))
+    print(os.path.basename(new_file_name) + '\t...雙語完成（' + str(len(events)) + ' 行）\n')
+    return new_file_name
+
+
+def clip_events(events, start, end):
+    """
+    Find events overlapping [start, end) ms with an interval index,
+    return copies cut to the range and rebased to start
+    """
+    events = [sub for sub in events if not sub.is_comment]
+    index = SubtitleTrack.from_fields([(sub.start, sub.end, '') for sub in events]).index()
+    clipped = []
+    for position in index.overlap(start, end):
+        sub = events[position].copy()
+        sub.start, sub.end = max(sub.start, start) - start, min(sub.end, end) - start
+        clipped.append(sub)
+    return clipped
+
+
+def clip_subtitle(file_name, start, end):
+    """
+    Extract events between start and end ms into a new subtitle rebased to 0,
+    ass/ssa keep their styles, xml/dfxp are written as ttml
+    """
+    if end <= start:
+        print('結束時間需晚於開始時間\n')
+        return None
+    print('\n擷取片段：' + ms_to_srt_time(start) + ' --> ' + ms_to_srt_time(end) +
+          '\n---------------------------------------------------------------')
+    suffix = Path(file_name).suffix
+    if suffix in ('.ass', '.ssa'):
+        subs = pysubs2.load(file_name, format_=suffix.lstrip('.'))
+        subs.events = clip_events(subs.events, start, end)
+        new_file_name = os.path.splitext(file_name)[0] + '-clip' + suffix
+        subs.save(new_file_name)
+        count = len(subs.events)
+    else:
+        target = suffix.lstrip('.') if suffix.lstrip('.') in SUBTITLE_WRITERS else 'ttml'
+        events = clip_events(parse_subtitle_content(file_name, decode_subtitle(Path(file_name).read_bytes())),
+                             start, end)
+        new_file_name = os.path.splitext(file_name)[0] + '-clip.' + target
+        with open(new_file_name, 'w', encoding='utf-8') as f:
+            f.write(SUBTITLE_WRITERS[target](events))
+        count = len(events)
+    print(os.path.basename(new_file_name) + '\t...擷取完成（' + str(count) + ' 行）\n')
+    return new_file_name
+
+
+def format_events_at(file_name, track, ms):
+    """Format events of track on screen at ms"""
+    return '\n' + os.path.basename(file_name) + '：' + ms_to_srt_time(ms) + \
+        '\n---------------------------------------------------------------\n' + \
+        ''.join(ms_to_srt_time(track.starts[index]) + ' --> ' + ms_to_srt_time(track.ends[index]) + '\n' +
+                track.texts[index].replace('\\N', '\n') + '\n\n' for index in track.index().at(ms))
+
+
+def print_events_at(file_name, ms):
+    """Print events on screen at ms"""
+    print(format_events_at(file_name, load_decoded_track(file_name), ms), end='')
 
 
 def format_subtitle(file_name):
     """
     Format subtitle
     """
+    if Path(file_name).suffix == '.srt' and is_srt_file(file_name):
+        rewrite_srt(file_name)
+        return file_name
     subs = pysubs2.load(file_name)
     subs.save(file_name)
+    return file_name
+
 
+def is_animated_fragment(sub):
+    """Check if event is a karaoke, \\move or \\t fragment, or a frame-by-frame one"""
+    return sub.end - sub.start <= COALESCE_FRAGMENT or ANIMATION_TAGS.search(sub.text) is not None
 
-def translate_subtitle(file_name, is_simplified):
+
+def coalesce_events(events, window=COALESCE_WINDOW, gap=COALESCE_GAP, animated_only=False):
     """
-    Uniform punctuation and translate term to Traditional Chinese
+    Collapse events with the same text and contiguous or overlapping times,
+    only animated fragments if animated_only is set,
+    yield each event once it leaves the sliding window
     """
+    pending = deque()
+    recent = {}
+    for sub in events:
+        if animated_only and not is_animated_fragment(sub):
+            pending.append((None, sub))
+        else:
+            key = OVERRIDE_TAGS.sub('', sub.text).strip()
+            event = recent.get(key)
+            if key and event and sub.start <= event.end + gap and sub.end >= event.start - gap:
+                event.start = min(event.start, sub.start)
+                event.end = max(event.end, sub.end)
+                continue
 
-    if is_simplified:
-        Path(file_name).write_text(OpenCC('s2tw.json').convert(Path(file_name).read_text("utf8")), "utf8")
+            recent[key] = sub
+            pending.append((key, sub))
 
-    subs = pysubs2.load(file_name)
+        if len(pending) > window:
+            old_key, old_event = pending.popleft()
+            if recent.get(old_key) is old_event:
+                del recent[old_key]
+            yield old_event
 
-    path = file_name.split(os.path.basename(file_name))[0]
-    new_file_name = rename_subtitle(file_name)
-    new_file_name = re.sub(r'(-|\.)ch[st]+', '', new_file_name, flags=re.I)
-    new_file_name = re.sub(r'-AREA11', '', new_file_name)
-    new_file_name = re.sub(
-        r'(.+?)(\.)*[sS]([0-9]{2})[eE]([0-9]{2})(-E[0-9]{2})*.+',
-        '\\1.S\\3E\\4\\5.srt',
-        new_file_name)
-
-    if '.zh' not in new_file_name:
-        new_file_name = new_file_name.replace('.srt', '.zh.srt')
+    for _, event in pending:
+        yield event
 
-    print('\n' + new_file_name)
-    print("\n訂正錯字、修改成台灣慣用語：\n---------------------------------------------------------------")
 
-    original_line_num = len(subs)
-    delete_list = []
+def fix_subtitle(subs):
+    """
+    Uniform punctuation and translate terms of events in place,
+    return typo compare list, overlap list and illegal character list
+    """
     typo_compare_list = []
+    overlap_list = []
+    illegal_list = []
+
+    # 合併動態字幕，避免重複翻譯
+    events = merge_same_time_events(clean_events(coalesce_events(subs.events, animated_only=True), typo_compare_list))
+    subs.events = list(finish_events(sorted(events), overlap_list, illegal_list))
 
-    for i, sub in enumerate(subs):
+    # 錯字比較對應到修正後的行數
+    index_of = {(sub.start, sub.end): i + 1 for i, sub in enumerate(subs)}
+    for typo_compare in typo_compare_list:
+        if (typo_compare['start'], typo_compare['end']) in index_of:
+            typo_compare['index'] = index_of[(typo_compare['start'], typo_compare['end'])]
+
+    return typo_compare_list, overlap_list, illegal_list
+
+
+def clean_events(events, typo_compare_list):
+    """
+    Uniform punctuation and translate terms of events one by one,
+    drop empty and credit events, append corrections to typo compare list
+    """
+    for sub in events:
         text = sub.text.strip()
 
         if not text or text == '' or text == '\\n':
-            delete_list.append(i)
             continue
 
         if sub.start == 0 and sub.end == 0:
-            delete_list.append(i)
             continue
 
         if re.search(r'.*?字幕翻譯.*?', text):
-            delete_list.append(i)
             continue
 
         if re.search(r'\{\\.*?(pos|fad)\([0-9\.]+,[0-9\.]+\).*?\}', text):
@@ -195,7 +876,6 @@ def translate_subtitle(file_name, is_simplified):
 
         if text == '我去':
             text = text.replace('我去', '')
-            delete_list.append(i)
             continue
 
         text = re.sub(r',([\u4E00-\u9FFF]+)', ' \\1', text)
@@ -362,7 +1042,7 @@ def translate_subtitle(file_name, is_simplified):
         # 修正錯別字
         text = dictionary.translate(text, dictionary.TYPO)
 
-        subs[i].text = text
+        sub.text = text
 
         # 錯字比較
         if original_text != text:
@@ -373,100 +1053,338 @@ def translate_subtitle(file_name, is_simplified):
             typo_compare['new_text'] = text
             typo_compare_list.append(typo_compare)
 
-    for i in reversed(delete_list):
-        del subs[i]
+        yield sub
+
 
-    delete_list = []
-    for i, sub in enumerate(subs):
+def merge_same_time_events(events):
+    """
+    Merge events with the same start and end into one,
+    only the previous event is kept until the next one arrives
+    """
+    previous = None
+    previous_deleted = False
+    for sub in events:
         text = sub.text
+        deleted = False
 
-        if i > 0 and sub.start == subs[i-1].start and sub.end == subs[i-1].end:
+        if previous is not None and sub.start == previous.start and sub.end == previous.end:
             if text.replace('（', '').replace('）', '') \
-                    == subs[i-1].text.replace('（', '').replace('）', ''):
+                    == previous.text.replace('（', '').replace('）', ''):
 
-                if subs[i-1].text[0] == '（':
-                    delete_list.append(i)
+                if previous.text[0] == '（' or previous_deleted:
+                    deleted = True
                 else:
-                    delete_list.append(i-1)
+                    previous_deleted = True
 
             else:
                 if text[0] == '（':
-                    if subs[i-1].text[0] == '（':
-                        if "）\\n" in subs[i-1].text:
-                            match = list(re.finditer(r'）\\n', subs[i-1].text))
+                    if previous.text[0] == '（':
+                        if "）\\n" in previous.text:
+                            match = list(re.finditer(r'）\\n', previous.text))
                             pos = match[-1].span()[1]
                             if match:
-                                subs[i-1].text = subs[i-1].text[:pos] + \
-                                    text + '\\n' + subs[i-1].text[pos:]
+                                previous.text = previous.text[:pos] + \
+                                    text + '\\n' + previous.text[pos:]
                         else:
-                            subs[i-1].text = subs[i-1].text + '\\n' + text
+                            previous.text = previous.text + '\\n' + text
                     else:
-                        subs[i-1].text = text + '\\n' + subs[i-1].text
+                        previous.text = text + '\\n' + previous.text
                 else:
-                    subs[i-1].text = subs[i-1].text + '\\n' + text
-                delete_list.append(i)
-        else:
-            subs[i].text = text
+                    previous.text = previous.text + '\\n' + text
+                deleted = True
 
-    for i in reversed(delete_list):
-        del subs[i]
+        if previous is not None and not previous_deleted:
+            yield previous
+        previous, previous_deleted = sub, deleted
 
-    subs.sort()
+    if previous is not None and not previous_deleted:
+        yield previous
 
-    overlap_num = 0
-    overlap_list = []
 
-    for i, sub in enumerate(subs):
+def sort_events(events, window=STREAM_SORT_WINDOW):
+    """
+    Sort events time-wise with a bounded reorder buffer,
+    events displaced further than window are yielded as they come
+    """
+    pending = []
+    for order, sub in enumerate(events):
+        heapq.heappush(pending, (sub.start, sub.end, order, sub))
+        if len(pending) > window:
+            yield heapq.heappop(pending)[3]
+    while pending:
+        yield heapq.heappop(pending)[3]
+
+
+def finish_events(events, overlap_list, illegal_list):
+    """
+    Tidy sorted events one by one, append overlapping index
+    and illegal characters to overlap list and illegal list
+    """
+    previous = None
+    for i, sub in enumerate(events):
         text = sub.text
         text = text.replace('）\\n（', '\\n')
         if re.search(r'（註：.+?）\\n', text, flags=re.S):
             tmp = text.split('）\\n')
             text = tmp[1] + '\\n' + tmp[0] + '）'
         text = text.replace('  ', ' ')
-        subs[i].text = text
+        sub.text = text
 
         illegal_character = re.findall(
             r'[^αa-zA-Z0-9\u4E00-\u9FFF!?\[\]\{\}&/\\,\.;:\(\)%$><=\'\"~\+\-\* （），。、——＋！×？⁉︎：・…「」／→←〈〉《》＞＜～％｜♥★♪＆©\n]', text)
         if len(illegal_character) > 0:
-            print('非法字源：\n' + str(i+1) + '\n' + pysubs2.subrip.SubripFormat.ms_to_timestamp(sub.start) +
-                  ' --> ' + pysubs2.subrip.SubripFormat.ms_to_timestamp(sub.end) + '\n' +
-                  text.replace('\\n', '\n') + '\n\n')
-            print(illegal_character)
+            illegal_list.append({'index': i + 1, 'start': sub.start, 'end': sub.end,
+                                 'text': text, 'characters': illegal_character})
 
 
-        subs[i].text = fix_overlength(text)
+        sub.text = fix_overlength(text)
 
 
         if i > 0:
-            if sub.start < subs[i-1].start or sub.end < subs[i-1].end or sub.start < subs[i-1].end:
-                overlap_num += 1
+            if sub.start < previous.start or sub.end < previous.end or sub.start < previous.end:
                 overlap_list.append(i)
 
-        for typo_compare in typo_compare_list:
-            if typo_compare['start'] == sub.start and typo_compare['end'] == sub.end:
-                typo_compare.update({'index': i + 1})
+        previous = sub
+        yield sub
 
-    # 字幕重疊
-    if overlap_num > 0:
-        overlap_file = open(
-            path + new_file_name.replace('.srt', '-字幕重疊.txt'), 'w', encoding='utf-8')
-        for index in overlap_list:
-            text = subs[index].text
-            overlap_file.write(str(index) + '\n' + pysubs2.subrip.SubripFormat.ms_to_timestamp(subs[index].start) +
-                               ' --> ' + pysubs2.subrip.SubripFormat.ms_to_timestamp(subs[index].end) + '\n' +
-                               text.replace('\\N', '\n') + '\n\n')
-
-    subs.save(path + new_file_name)
-
-    if path + new_file_name != file_name:
+
+def translate_subtitle(file_name, is_simplified, events=None):
+    """
+    Uniform punctuation and translate term to Traditional Chinese,
+    translate events instead of loading file_name if events is given
+    """
+
+    remove_source = events is None
+    if events is None:
+        if is_srt_file(file_name):
+            return translate_srt_stream(file_name, is_simplified)
+        events = pysubs2.load(file_name).events
+
+    subs = pysubs2.SSAFile()
+    subs.events.extend(events)
+    if is_simplified:
+        converter = get_opencc()
+        for sub in subs:
+            sub.text = converter.convert(sub.text)
+
+    output_file, console = write_translate_result(file_name, fix_events(subs), remove_source)
+    print(console, end='')
+
+    return output_file
+
+
+def is_srt_file(file_name):
+    """Check if file is srt by its first lines, as pysubs2 guesses format by content"""
+    with open(file_name, 'r', encoding='utf-8', errors='ignore') as f:
+        head = f.read(4096)
+    return pysubs2.subrip.SubripFormat.guess_format(head) == 'srt'
+
+
+def read_srt_events(lines):
+    """Read srt events one at a time, text is prepared the same way as pysubs2"""
+    block = []
+    for line in lines:
+        if len(pysubs2.subrip.SubripFormat.TIMESTAMP.findall(line)) == 2:
+            if block:
+                yield parse_srt_block(block)
+            block = [line]
+        elif block:
+            block.append(line)
+    if block:
+        yield parse_srt_block(block)
+
+
+def parse_srt_block(block):
+    """Parse timing line and following lines into SSAEvent"""
+    start, end = pysubs2.subrip.SubripFormat.TIMESTAMP.findall(block[0])
+    try:
+        return pysubs2.ssaevent.SSAEvent(start=srt_time_to_ms(*start), end=srt_time_to_ms(*end),
+                                         text=prepare_srt_text(''.join(block[1:])))
+    except KeyError:
+        subs = pysubs2.SSAFile()
+        pysubs2.subrip.SubripFormat.from_file(subs, block, 'srt')
+        return subs.events[0]
+
+
+def write_srt_events(events, f):
+    """Write srt events one at a time, return number of written events"""
+    line_num = 0
+    for sub in events:
+        if sub.is_comment:
+            continue
+        block = dump_srt_event(sub, line_num + 1)
+        if block is not None:
+            line_num += 1
+            f.write(block)
+    return line_num
+
+
+def rewrite_srt(file_name, process=None):
+    """Rewrite srt file through process one event at a time, in place"""
+    temp_file = file_name + '.part'
+    with open(file_name, 'r', encoding='utf-8') as source, \
+            open(temp_file, 'w', encoding='utf-8') as output:
+        events = read_srt_events(source)
+        write_srt_events(process(events) if process else events, output)
+    os.replace(temp_file, file_name)
+
+
+def translate_srt_stream(file_name, is_simplified):
+    """
+    Translate srt file one event at a time, only coalescing, sorting
+    and overlap check keep a bounded window of events in memory
+    """
+    path, new_file_name = get_translated_file_name(file_name)
+    output_file = path + new_file_name
+    temp_file = output_file + '.part'
+    converter = get_opencc() if is_simplified else None
+    typo_compare_list = []
+    overlap_list = []
+    illegal_list = []
+    pending_typo = {}
+    count = {'original': 0, 'fixed': 0, 'overlap': 0}
+
+    def read(source):
+        for sub in read_srt_events(source):
+            count['original'] += 1
+            if converter:
+                sub.text = converter.convert(sub.text)
+            yield sub
+
+    with contextlib.ExitStack() as stack:
+        source = stack.enter_context(open(file_name, 'r', encoding='utf-8'))
+        output = stack.enter_context(open(temp_file, 'w', encoding='utf-8'))
+        reports = {}
+
+        def report(suffix):
+            if suffix not in reports:
+                reports[suffix] = stack.enter_context(open(
+                    path + new_file_name.replace('.srt', suffix), 'w', encoding='utf-8'))
+            return reports[suffix]
+
+        def finished():
+            events = merge_same_time_events(clean_events(coalesce_events(read(source), animated_only=True), typo_compare_list))
+            for i, sub in enumerate(finish_events(sort_events(events), overlap_list, illegal_list)):
+                count['fixed'] += 1
+                # 錯字比較對應到修正後的行數
+                for typo_compare in typo_compare_list:
+                    pending_typo.setdefault((typo_compare['start'], typo_compare['end']), []).append(typo_compare)
+                typo_compare_list.clear()
+                for typo_compare in pending_typo.pop((sub.start, sub.end), []):
+                    typo_compare['index'] = i + 1
+                    report('-修正錯字.txt').write(format_typo_compare([typo_compare]))
+                # 字幕重疊
+                if overlap_list:
+                    count['overlap'] += 1
+                    report('-字幕重疊.txt').write(format_overlap(
+                        {'index': i + 1, 'start': sub.start, 'end': sub.end, 'text': sub.text}))
+                    overlap_list.clear()
+                yield sub
+
+        write_srt_events(finished(), output)
+
+    os.replace(temp_file, output_file)
+    if output_file != file_name:
         os.remove(file_name)
 
-    print('{0: <15}'.format("原始行數：" + str(original_line_num)) +
-          '{0: <15}'.format("修正後行數：" + str(len(subs))) +
-          '{0: <15}'.format("重疊行數：" + str(overlap_num)) + '\n')
+    print(get_translate_console(new_file_name, illegal_list, count['original'],
+                                count['fixed'], count['overlap']), end='')
+    return output_file
+
+
+def get_translated_file_name(file_name):
+    """Get directory and new file name of translated subtitle"""
+    path = file_name.split(os.path.basename(file_name))[0]
+    new_file_name = rename_subtitle(file_name)
+    new_file_name = re.sub(r'(-|\.)ch[st]+', '', new_file_name, flags=re.I)
+    new_file_name = re.sub(r'-AREA11', '', new_file_name)
+    new_file_name = re.sub(
+        r'(.+?)(\.)*[sS]([0-9]{2})[eE]([0-9]{2})(-E[0-9]{2})*.+',
+        '\\1.S\\3E\\4\\5.srt',
+        new_file_name)
+
+    if '.zh' not in new_file_name:
+        new_file_name = new_file_name.replace('.srt', '.zh.srt')
+
+    return path, new_file_name
+
+
+def fix_events(subs, output='srt'):
+    """Fix events, return fixed subtitle text, events, corrections and QC findings"""
+    original_line_num = len(subs)
+    typo_compare_list, overlap_list, illegal_list = fix_subtitle(subs)
+    return {
+        'subtitle': dump_srt_events(subs, subs.styles) if output == 'srt' else subs.to_string(output),
+        'events': [{'start': sub.start, 'end': sub.end, 'text': sub.text} for sub in subs],
+        'original_line_num': original_line_num,
+        'corrections': typo_compare_list,
+        'overlaps': [{'index': i + 1, 'start': subs[i].start, 'end': subs[i].end,
+                      'text': subs[i].text} for i in overlap_list],
+        'illegal_characters': illegal_list,
+    }
+
+
+def format_overlap(overlap):
+    """ 重疊字幕文字 """
+    return (str(overlap['index']) + '\n' + pysubs2.subrip.SubripFormat.ms_to_timestamp(overlap['start']) +
+            ' --> ' + pysubs2.subrip.SubripFormat.ms_to_timestamp(overlap['end']) + '\n' +
+            overlap['text'].replace('\\N', '\n') + '\n\n')
+
+
+def get_translate_console(new_file_name, illegal_list, original_line_num, line_num, overlap_num):
+    """Console output of translated subtitle"""
+    console = ['\n' + new_file_name + '\n',
+               "\n訂正錯字、修改成台灣慣用語：\n---------------------------------------------------------------\n"]
+
+    for illegal in illegal_list:
+        console.append('非法字源：\n' + str(illegal['index']) + '\n' + pysubs2.subrip.SubripFormat.ms_to_timestamp(illegal['start']) +
+                       ' --> ' + pysubs2.subrip.SubripFormat.ms_to_timestamp(illegal['end']) + '\n' +
+                       illegal['text'].replace('\\n', '\n') + '\n\n\n')
+        console.append(str(illegal['characters']) + '\n')
+
+    console.append('{0: <15}'.format("原始行數：" + str(original_line_num)) +
+                   '{0: <15}'.format("修正後行數：" + str(line_num)) +
+                   '{0: <15}'.format("重疊行數：" + str(overlap_num)) + '\n\n')
+    return ''.join(console)
+
+
+def get_translate_outputs(new_file_name, result):
+    """
+    Return translated subtitle, overlap and typo reports as
+    list of (file name, text), and console output
+    """
+    outputs = [(new_file_name, result['subtitle'])]
+    # 字幕重疊
+    if result['overlaps']:
+        outputs.append((new_file_name.replace('.srt', '-字幕重疊.txt'),
+                        ''.join(format_overlap(overlap) for overlap in result['overlaps'])))
 
     # 錯字比較
-    print_typo_compare(path + new_file_name.replace('.srt', '-修正錯字.txt'), typo_compare_list)
+    if result['corrections']:
+        outputs.append((new_file_name.replace('.srt', '-修正錯字.txt'),
+                        format_typo_compare(result['corrections'])))
+
+    return outputs, get_translate_console(new_file_name, result['illegal_characters'],
+                                          result['original_line_num'], len(result['events']),
+                                          len(result['overlaps']))
+
+
+def write_translate_result(file_name, result, remove_source):
+    """
+    Write translated subtitle, overlap and typo reports,
+    return output file and console output
+    """
+    path, new_file_name = get_translated_file_name(file_name)
+    outputs, console = get_translate_outputs(new_file_name, result)
+    for output_name, text in outputs:
+        with open(path + output_name, 'w', encoding='utf-8') as output_file:
+            output_file.write(text)
+
+    if remove_source and path + new_file_name != file_name:
+        os.remove(file_name)
+
+    return path + new_file_name, console
+
 
 def fix_overlength(text):
     """ 修正過長字幕 """
@@ -522,12 +1440,9 @@ def print_overlength(file_name, overlength_list):
     if len(overlength_list) == 0:
         sys.exit()
 
-def print_typo_compare(file_name, typo_compare_list):
-    """ 印出錯字 """
-    if len(typo_compare_list) == 0:
-        sys.exit()
-
-    typo_compare_file = open(file_name, 'w', encoding='utf-8')
+def format_typo_compare(typo_compare_list):
+    """ 錯字比較文字 """
+    typo_compare_file = io.StringIO()
     for typo_compare in typo_compare_list:
         typo_compare_file.write(str(typo_compare['index']) + '\n')
 
@@ -568,25 +1483,27 @@ def print_typo_compare(file_name, typo_compare_list):
 
         typo_compare_file.write('\n')
 
+    return typo_compare_file.getvalue()
 
-def convert_subtitle(original_file):
-    """Convert subtitle extension"""
-    extension = Path(original_file).suffix
 
-    if extension != '.srt':
-        print("\n將" + extension +
-              " 轉換成.srt：\n---------------------------------------------------------------")
-        if extension == '.ssa' or extension == '.ass':
-            file_name = ass_to_srt(original_file)
-        elif extension == '.vtt':
-            file_name = vtt_to_srt(original_file)
-            print(file_name)
-        elif extension == '.xml':
-            file_name = xml_to_srt(original_file)
-    else:
-        file_name = original_file
+def convert_subtitle(original_file, targets=None):
+    """
+    Convert subtitle to one or more target formats from a single parse,
+    return converted file names
+    """
+    targets = targets or ['srt']
+    extension = Path(original_file).suffix
+    file_name = str(Path(original_file).parent) + '/' + rename_subtitle(original_file)
+    # 不覆寫原始字幕
+    source = os.path.normcase(os.path.abspath(original_file))
+    targets = [target for target in targets
+               if os.path.normcase(os.path.abspath(os.path.splitext(file_name)[0] + '.' + target)) != source]
+    if not targets:
+        return [original_file]
 
-    return file_name
+    print("\n將" + extension + " 轉換成" + '、'.join('.' + target for target in targets) +
+          "：\n---------------------------------------------------------------")
+    return write_subtitle(load_subtitle(original_file), file_name, targets)
 
 
 def rename_subtitle(original_file_name):
@@ -596,38 +1513,124 @@ def rename_subtitle(original_file_name):
     new_file_name = new_file_name.replace(".ssa", ".srt")
     new_file_name = new_file_name.replace(".vtt", ".srt")
     new_file_name = new_file_name.replace(".xml", ".srt")
+    new_file_name = new_file_name.replace(".ttml", ".srt")
+    new_file_name = new_file_name.replace(".dfxp", ".srt")
     new_file_name = new_file_name.replace('.rar', '')
     new_file_name = new_file_name.replace('.zip', '')
     new_file_name = new_file_name.replace('WEBRip', 'WEB-DL')
     return new_file_name
 
 
-def convert_ass_content(file_contents, ass_type: str):
-    """Convert content of vtt file to str format"""
+ASS_COLOR_TAG = re.compile(r'\{\\c\&[A-Z0-9]+\&\}')
+ASS_LEADING_TAGS = re.compile(r'^(\{.+?\})+')
+ASS_EVENT_FORMAT = ['Layer', 'Start', 'End', 'Style', 'Name',
+                    'MarginL', 'MarginR', 'MarginV', 'Effect', 'Text']
+ASS_ZERO_MARGIN = re.compile(r'0+')
 
-    replacement = re.sub(r"\{\\c\&[A-Z0-9]+\&\}", "", file_contents)
 
-    if ass_type == '.ssa':
-        replacement = re.sub(r"&H[A-Z0-9]{6,8}", "0", replacement)
+def wrap_caption(text):
+    """Wrap caption text with （）"""
+    return '（' + text + '）'
 
-    replacement = re.sub(
-        r",[cC]aption.*?,.*?,[0]+,[0]+,[0]+,.*?,(\{.+?\})*(.+)", r",Caption,,0000,0000,0000,,（\2）", replacement)
-    replacement = re.sub(
-        r",[cC]omment.*?,.*?,[0]+,[0]+,[0]+,.*?,(\{.+?\})*(.+)", r",Comment,,0000,0000,0000,,（\2）", replacement)
-    replacement = re.sub(
-        r",[nN]ote.*?,.*?,[0]+,[0]+,[0]+,.*?,(\{.+?\})*(.+)", r",Note,,0000,0000,0000,,（\2）", replacement)
-    replacement = re.sub(
-        r",註釋,.*?,[0]+,[0]+,[0]+,.*?,(\{.+?\})*(.+)", r",註釋,,0000,0000,0000,,（\2）", replacement)
-    replacement = re.sub(
-        r",[cC]hat.*?,.*?,[0]+,[0]+,[0]+,.*?,(\{.+?\})*(.+)", r",Chat,,0000,0000,0000,,（\2）", replacement)
-    replacement = re.sub(
-        r",[lL]yrics.*?,.*?,[0]+,[0]+,[0]+,.*?,(\{.+?\})*(.+)", r",Lyrics,,0000,0000,0000,,{\\an8}\2", replacement)
-    replacement = re.sub(
-        r",歌詞.*?,.*?,[0]+,[0]+,[0]+,.*?,(\{.+?\})*(.+)", r",Lyrics,,0000,0000,0000,,{\\an8}\2", replacement)
-    replacement = re.sub(
-        r",[sS]ong.*?,.*?,[0]+,[0]+,[0]+,.*?,(\{.+?\})*(.+)", r",Song,,0000,0000,0000,,{\\an8}\2", replacement)
 
-    return replacement
+def align_top(text):
+    """Show text at the top of the screen"""
+    return '{\\an8}' + text
+
+
+def drop_text(text):
+    """Drop event"""
+    return None
+
+
+def keep_text(text, style):
+    """Default handler of unknown ass style: keep text as it is"""
+    return text
+
+
+# (style pattern, action)
+ASS_STYLE_TABLE = [
+    (r'[cC]aption', wrap_caption),
+    (r'[cC]omment', wrap_caption),
+    (r'[nN]ote', wrap_caption),
+    (r'註釋$', wrap_caption),
+    (r'[cC]hat', wrap_caption),
+    (r'[lL]yrics', align_top),
+    (r'歌詞', align_top),
+    (r'[sS]ong', align_top),
+]
+
+
+def compile_style_table(style_table):
+    """Compile (style pattern, action) table"""
+    return [(re.compile(pattern), action) for pattern, action in style_table]
+
+
+COMPILED_ASS_STYLE_TABLE = compile_style_table(ASS_STYLE_TABLE)
+
+
+def has_zero_margins(event):
+    """Check if MarginL/R/V of ass event are all 0, only those get their style action"""
+    return all(ASS_ZERO_MARGIN.fullmatch(event.get(field, '0').strip())
+               for field in ('MarginL', 'MarginR', 'MarginV'))
+
+
+def get_style_action(style, style_table):
+    """Find action of ass style"""
+    for pattern, action in style_table:
+        if pattern.match(style):
+            return action
+    return None
+
+
+def convert_ass_content(file_contents, style_table=None, unknown_style=keep_text):
+    """Convert events of ass/ssa file to list of SSAEvent"""
+
+    if style_table is None:
+        style_table = COMPILED_ASS_STYLE_TABLE
+
+    subs = []
+    fields = ASS_EVENT_FORMAT
+    in_events = False
+    for line in file_contents.splitlines():
+        line = line.strip()
+        if line.startswith('['):
+            in_events = line.lower() == '[events]'
+            continue
+        if not in_events:
+            continue
+
+        key, _, value = line.partition(':')
+        if key == 'Format':
+            fields = [field.strip() for field in value.split(',')]
+            continue
+        if key != 'Dialogue':
+            continue
+
+        event = dict(zip(fields, value.strip().split(',', len(fields) - 1)))
+        if 'Text' not in event:
+            continue
+
+        text = ASS_COLOR_TAG.sub('', event['Text'])
+        style = event.get('Style', '').strip()
+        action = get_style_action(style, style_table)
+        if action:
+            # 有邊界的事件是另外定位的字幕，保持原樣
+            if has_zero_margins(event):
+                text = action(ASS_LEADING_TAGS.sub('', text))
+        else:
+            text = unknown_style(text, style)
+
+        if text is None:
+            continue
+
+        start = pysubs2.time.timestamp_to_ms(
+            pysubs2.time.TIMESTAMP.match(event['Start']).groups())
+        end = pysubs2.time.timestamp_to_ms(
+            pysubs2.time.TIMESTAMP.match(event['End']).groups())
+        subs.append(pysubs2.ssaevent.SSAEvent(start=start, end=end, text=text))
+
+    return subs
 
 
 def convert_vtt_content(file_contents):
@@ -670,34 +1673,639 @@ def convert_vtt_content(file_contents):
     return replacement
 
 
-def convert_xml_content(file_contents):
-    """Convert xml content"""
+VTT_TIMING = re.compile(
+    r'^((?:\d+:)?\d{2}:\d{2}[.,]\d{3})\s+-->\s+((?:\d+:)?\d{2}:\d{2}[.,]\d{3})(.*)$')
+VTT_LINE_POSITION = re.compile(r'line:(\d+(?:\.\d+)?)%')
+
+
+def vtt_time_to_ms(value):
+    """Convert webvtt timestamp to ms"""
+    parts = value.replace(',', '.').split(':')
+    hours = int(parts[-3]) if len(parts) > 2 else 0
+    return round((hours * 3600 + int(parts[-2]) * 60 + float(parts[-1])) * 1000)
+
+
+def parse_vtt_segment(file_contents):
+    """
+    Parse one webvtt segment,
+    return (MPEGTS, LOCAL ms) of X-TIMESTAMP-MAP or None, and list of SSAEvent
+    """
+    timestamp_map = None
     subs = []
-    soup = BeautifulSoup(file_contents, 'xml')
-    for section in soup.findAll('dia'):
-        start_time = int(section.find('st').getText())
-        end_time = int(section.find('et').getText())
-        text = section.find('sub').getText()
-        if text[0] == '[':
-            text = text.replace('[', '（', 1)
-        if text[-1] == ']':
-            text = text[:-1] + '）'
-
-        text = text.replace('， ', '，')
-
-        position = section.find('position')['vertical-margin']
-        if position and int(position.strip('%')) < 20:
+    for block in re.split(r'\n\s*\n', file_contents.replace('\r\n', '\n').strip()):
+        lines = block.strip('\n').split('\n')
+        if lines[0].startswith('WEBVTT'):
+            for line in lines:
+                if line.startswith('X-TIMESTAMP-MAP='):
+                    mapping = dict(item.partition(':')[::2]
+                                   for item in line.split('=', 1)[1].split(','))
+                    timestamp_map = (int(mapping.get('MPEGTS', 0)),
+                                     vtt_time_to_ms(mapping.get('LOCAL', '00:00.000')))
+            continue
+
+        for i, line in enumerate(lines):
+            timing = VTT_TIMING.match(line.strip())
+            if timing:
+                break
+        else:
+            continue
+
+        text = '\\N'.join(lines[i+1:])
+        text = text.replace('&lrm;', '').replace('&rlm;', '')
+        text = re.sub(r'<[^>]+>', '', text).strip()
+        if not text:
+            continue
+
+        position = VTT_LINE_POSITION.search(timing.group(3))
+        if position and float(position.group(1)) < 20:
             text = '{\\an8}' + text
 
-        subs.append(pysubs2.ssaevent.SSAEvent(start_time, end_time, text))
+        subs.append(pysubs2.ssaevent.SSAEvent(start=vtt_time_to_ms(timing.group(1)),
+                                              end=vtt_time_to_ms(timing.group(2)),
+                                              text=text))
+    return timestamp_map, subs
 
-    return subs
 
+def list_vtt_segments(path):
+    """List webvtt segments of a directory or a m3u8 playlist in order"""
+    if os.path.isdir(path):
+        segments = [os.path.join(path, f) for f in os.listdir(path)
+                    if Path(f).suffix in ('.vtt', '.webvtt')]
+        return sorted(segments, key=lambda segment: [
+            int(part) if part.isdigit() else part
+            for part in re.split(r'(\d+)', os.path.basename(segment))])
+
+    segments = []
+    for line in read_text_file(path).splitlines():
+        line = line.strip()
+        if line and not line.startswith('#'):
+            segment = os.path.join(os.path.dirname(path), line.split('?')[0])
+            if os.path.exists(segment):
+                segments.append(segment)
+            else:
+                print(line + " 檔案不存在\n")
+    return segments
+
+
+def convert_vtt_segments(path, window=SEGMENT_WINDOW):
+    """
+    Convert webvtt segments into one stream of SSAEvent,
+    apply X-TIMESTAMP-MAP offset and merge cues repeated across segments
+    """
+    def segment_events():
+        base = None
+        for segment in list_vtt_segments(path):
+            with open(segment, 'r', encoding='utf-8-sig') as f:
+                timestamp_map, subs = parse_vtt_segment(f.read())
+
+            offset = 0
+            if timestamp_map:
+                if base is None:
+                    base = timestamp_map
+                mpegts, local = timestamp_map
+                if mpegts < base[0]:
+                    mpegts += MPEGTS_ROLLOVER
+                offset = (mpegts - base[0]) // MPEGTS_CLOCK - (local - base[1])
+
+            for sub in subs:
+                sub.start += offset
+                sub.end += offset
+                yield sub
+
+    return coalesce_events(segment_events(), window)
+
+
+def convert_xml_content(source):
+    """Convert <dia> elements of xml file to SSAEvent one by one"""
+    for _, section in etree.iterparse(source, events=('end',), tag='dia', recover=True):
+        start_time = int(section.findtext('st'))
+        end_time = int(section.findtext('et'))
+        sub = section.find('sub')
+        text = ''.join(sub.itertext()) if sub is not None else ''
+        if text:
+            if text[0] == '[':
+                text = text.replace('[', '（', 1)
+            if text[-1] == ']':
+                text = text[:-1] + '）'
+
+            text = text.replace('， ', '，')
+
+            position = section.find('position')
+            if position is not None:
+                position = position.get('vertical-margin')
+            if position and int(position.strip('%')) < 20:
+                text = '{\\an8}' + text
+
+            yield pysubs2.ssaevent.SSAEvent(start=start_time, end=end_time, text=text)
+
+        # 釋放已處理的節點
+        section.clear()
+        while section.getprevious() is not None:
+            del section.getparent()[0]
+
+
+TTML_CLOCK_TIME = re.compile(r'^(\d+):(\d{2}):(\d{2})(?:([.:])(\d+(?:\.\d+)?))?$')
+TTML_OFFSET_TIME = re.compile(r'^(\d+(?:\.\d+)?)(h|ms|m|s|f|t)$')
+XML_ID = '{http://www.w3.org/XML/1998/namespace}id'
+TTML_STYLE_TAGS = [('fontStyle', 'italic', 'i'),
+                   ('fontWeight', 'bold', 'b'),
+                   ('textDecoration', 'underline', 'u')]
+TTML_ROOT = re.compile(r'<(\w+:)?tt[\s>]')
+XML_DECLARATION = re.compile(r'^\s*<\?xml[^>]*\?>')
+
+
+def is_ttml(file_name):
+    """Check if xml file is ttml/dfxp"""
+    with open(file_name, 'r', encoding='utf-8', errors='ignore') as f:
+        head = f.read(2048)
+    return bool(TTML_ROOT.search(head))
+
+
+def get_ttml_attribute(element, name):
+    """Get attribute of ttml element regardless of its namespace"""
+    for key, value in element.attrib.items():
+        if etree.QName(key).localname == name:
+            return value
+    return None
+
+
+def get_ttml_timing(element):
+    """Get frame rate, sub-frame rate and tick rate from <tt>"""
+    frame_rate = float(get_ttml_attribute(element, 'frameRate') or 30)
+    multiplier = get_ttml_attribute(element, 'frameRateMultiplier')
+    if multiplier:
+        numerator, denominator = multiplier.split()
+        frame_rate = frame_rate * int(numerator) / int(denominator)
+    sub_frame_rate = int(get_ttml_attribute(element, 'subFrameRate') or 1)
+
+    tick_rate = get_ttml_attribute(element, 'tickRate')
+    if tick_rate:
+        tick_rate = int(tick_rate)
+    elif get_ttml_attribute(element, 'frameRate'):
+        tick_rate = frame_rate * sub_frame_rate
+    else:
+        tick_rate = 1
+
+    extent = get_ttml_attribute(element, 'extent')
+    height = None
+    if extent and extent.endswith('px'):
+        height = float(extent.split()[-1][:-2])
+
+    return {'frame_rate': frame_rate, 'sub_frame_rate': sub_frame_rate,
+            'tick_rate': tick_rate, 'height': height}
+
+
+def ttml_time_to_ms(value, timing):
+    """Convert ttml clock time or offset time to ms"""
+    value = value.strip()
+    clock = TTML_CLOCK_TIME.match(value)
+    if clock:
+        hours, minutes, seconds, separator, fraction = clock.groups()
+        seconds = int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+        if separator == '.':
+            seconds += float('0.' + fraction)
+        elif separator == ':':
+            frames, _, sub_frames = fraction.partition('.')
+            frames = int(frames) + int(sub_frames or 0) / timing['sub_frame_rate']
+            seconds += frames / timing['frame_rate']
+        return round(seconds * 1000)
+
+    offset = TTML_OFFSET_TIME.match(value)
+    if offset:
+        number, metric = float(offset.group(1)), offset.group(2)
+        scale = {'h': 3600000, 'm': 60000, 's': 1000, 'ms': 1,
+                 'f': 1000 / timing['frame_rate'], 't': 1000 / timing['tick_rate']}
+        return round(number * scale[metric])
+
+    raise ValueError('Unknown ttml time: ' + value)
+
+
+def get_ttml_style(element, styles):
+    """Merge referenced styles and inline tts:* attributes of element"""
+    style = {}
+    for style_id in (element.get('style') or '').split():
+        style.update(styles.get(style_id, {}))
+    for key, value in element.attrib.items():
+        name = etree.QName(key)
+        if name.namespace and name.namespace.endswith('#styling'):
+            style[name.localname] = value
+    return style
+
+
+def is_top_region(region, timing):
+    """Check if region is at the top of the screen"""
+    display_align = region.get('displayAlign')
+    origin = region.get('origin')
+    if origin and len(origin.split()) == 2:
+        y = origin.split()[1]
+        if y.endswith('%'):
+            return float(y[:-1]) < 50
+        if y.endswith('px') and timing['height']:
+            return float(y[:-2]) < timing['height'] / 2
+    return display_align == 'before'
+
+
+def get_ttml_text(element, styles):
+    """Get text of ttml <p> or <span>, convert <br/> and span styling to ass tags"""
+    text = re.sub(r'\s+', ' ', element.text or '')
+    for child in element:
+        name = etree.QName(child).localname
+        if name == 'br':
+            text += '\\N'
+        elif name == 'span':
+            style = get_ttml_style(child, styles)
+            tags = [tag for key, value, tag in TTML_STYLE_TAGS if style.get(key) == value]
+            text += ''.join('{\\' + tag + '1}' for tag in tags) + \
+                get_ttml_text(child, styles) + \
+                ''.join('{\\' + tag + '0}' for tag in reversed(tags))
+        text += re.sub(r'\s+', ' ', child.tail or '')
+    return text
+
+
+def convert_ttml_content(source):
+    """Convert <p> elements of ttml/dfxp file to SSAEvent one by one"""
+    timing = get_ttml_timing(etree.Element('tt'))
+    styles = {}
+    top_regions = set()
+    for event, element in etree.iterparse(source, events=('start', 'end'), recover=True):
+        if not isinstance(element.tag, str):
+            continue
+        name = etree.QName(element).localname
+
+        if event == 'start':
+            if name == 'tt':
+                timing = get_ttml_timing(element)
+            continue
+
+        if name == 'style' and element.get(XML_ID):
+            styles[element.get(XML_ID)] = \
+                get_ttml_style(element, styles)
+        elif name == 'region':
+            region = get_ttml_style(element, styles)
+            for child in element:
+                region.update(get_ttml_style(child, styles))
+            # 沒有 xml:id 的 region 無法被引用
+            if element.get(XML_ID) and is_top_region(region, timing):
+                top_regions.add(element.get(XML_ID))
+        elif name == 'p':
+            offset = 0
+            region = element.get('region')
+            for ancestor in element.iterancestors():
+                if ancestor.get('begin'):
+                    offset += ttml_time_to_ms(ancestor.get('begin'), timing)
+                region = region or ancestor.get('region')
+
+            if element.get('begin'):
+                start_time = offset + ttml_time_to_ms(element.get('begin'), timing)
+                if element.get('end'):
+                    end_time = offset + ttml_time_to_ms(element.get('end'), timing)
+                else:
+                    end_time = start_time + ttml_time_to_ms(element.get('dur', '0s'), timing)
+
+                style = get_ttml_style(element, styles)
+                tags = [tag for key, value, tag in TTML_STYLE_TAGS if style.get(key) == value]
+                text = '\\N'.join(filter(None, (line.strip() for line in
+                                                  get_ttml_text(element, styles).split('\\N'))))
+                if text:
+                    text = ''.join('{\\' + tag + '1}' for tag in tags) + text + \
+                        ''.join('{\\' + tag + '0}' for tag in reversed(tags))
+                    if region in top_regions:
+                        text = '{\\an8}' + text
+                    yield pysubs2.ssaevent.SSAEvent(start=start_time, end=end_time, text=text)
+
+            # 釋放已處理的節點
+            element.clear(keep_tail=True)
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+
+SRT_TIMING = re.compile(r'^[^\S\n]*(\d{1,2}):(\d{1,2}):(\d{1,2})[.,](\d{1,3})[^\S\n]*-->'
+                        r'[^\S\n]*(\d{1,2}):(\d{1,2}):(\d{1,2})[.,](\d{1,3})[^\S\n]*$', re.M)
+SRT_NEXT_NUMBER = re.compile(r'\n+ *\d+ *$')
+SRT_HTML_TAGS = [(re.compile(pattern), tag) for pattern, tag in (
+    (r'< *i *>', r'{\\i1}'), (r'< */ *i *>', r'{\\i0}'),
+    (r'< *s *>', r'{\\s1}'), (r'< */ *s *>', r'{\\s0}'),
+    (r'< *u *>', r'{\\u1}'), (r'< */ *u *>', r'{\\u0}'),
+    (r'< *b *>', r'{\\b1}'), (r'< */ *b *>', r'{\\b0}'))]
+SRT_OTHER_TAGS = re.compile(r'< */? *[a-zA-Z][^>]*>')
+SRT_NEWLINES = re.compile('\n+')
+SSA_OVERRIDE = pysubs2.ssaevent.SSAEvent.OVERRIDE_SEQUENCE
+SSA_STYLE_OVERRIDE = re.compile(r'\\[ibusp][0-9]|\\r[a-zA-Z_0-9 ]*')
+SRT_MAX_TIME = pysubs2.subrip.MAX_REPRESENTABLE_TIME
+
+# 時間戳查表：時分秒、毫秒（依位數補零）
+SRT_DIGITS = {**{str(i): i for i in range(100)}, **{f'{i:02d}': i for i in range(100)}}
+SRT_FRACTION = {**{str(i): i * 100 for i in range(10)}, **{f'{i:02d}': i * 10 for i in range(100)},
+                **{f'{i:03d}': i for i in range(1000)}}
+TWO_DIGITS = [f'{i:02d}' for i in range(100)]
+THREE_DIGITS = [f'{i:03d}' for i in range(1000)]
+
+
+def srt_time_to_ms(h, m, s, frac):
+    """Convert timestamp groups to ms with digit tables"""
+    return SRT_DIGITS[h] * 3600000 + SRT_DIGITS[m] * 60000 + SRT_DIGITS[s] * 1000 + SRT_FRACTION[frac]
+
+
+def ms_to_srt_time(ms):
+    """Convert ms to srt timestamp with digit tables"""
+    if ms < 0:
+        ms = 0
+    elif ms > SRT_MAX_TIME:
+        return pysubs2.subrip.SubripFormat.ms_to_timestamp(ms)
+    hours, ms = divmod(ms, 3600000)
+    minutes, ms = divmod(ms, 60000)
+    seconds, ms = divmod(ms, 1000)
+    return TWO_DIGITS[hours] + ':' + TWO_DIGITS[minutes] + ':' + TWO_DIGITS[seconds] + ',' + THREE_DIGITS[ms]
+
+
+def prepare_srt_text(body):
+    """Prepare text of lines after timing line, the same way as pysubs2"""
+    text = body.strip()
+    if text.isdecimal():
+        # 空白字幕：只剩下一行的編號
+        lines = body.split('\n')
+        if lines[-1] == '':
+            lines.pop()
+        if len(lines) >= 2 and not ''.join(lines[:-1]).strip():
+            return ''
+    text = SRT_NEXT_NUMBER.sub('', text)
+    if '<' in text:
+        for pattern, tag in SRT_HTML_TAGS:
+            text = pattern.sub(tag, text)
+        text = SRT_OTHER_TAGS.sub('', text)
+    return text.replace('\n', '\\N')
+
+
+def parse_srt_fields(text, detect=True):
+    """
+    Parse srt text into list of (start, end, text) with one pattern, fall back
+    to pysubs2 for anything unusual (not detected as srt, CR, extra timing text)
+    """
+    if '\r' in text or (detect and not is_srt_content(text)):
+        return parse_srt_fallback(text, None if detect else 'srt')
+
+    fields = []
+    previous = None
+    try:
+        for match in SRT_TIMING.finditer(text):
+            if previous:
+                fields.append((srt_time_to_ms(*previous.group(1, 2, 3, 4)), srt_time_to_ms(*previous.group(5, 6, 7, 8)),
+                               prepare_srt_text(text[previous.end() + 1:match.start()])))
+            previous = match
+        if previous:
+            fields.append((srt_time_to_ms(*previous.group(1, 2, 3, 4)), srt_time_to_ms(*previous.group(5, 6, 7, 8)),
+                           prepare_srt_text(text[previous.end() + 1:])))
+    except KeyError:
+        return parse_srt_fallback(text, 'srt')
+
+    if text.count('-->') != len(fields) or \
+            sum(1 for _ in pysubs2.time.TIMESTAMP.finditer(text)) != len(fields) * 2:
+        return parse_srt_fallback(text, 'srt')
+    return fields
+
+
+def parse_srt_fallback(text, format_):
+    """Parse srt text into list of (start, end, text) with pysubs2"""
+    return [(sub.start, sub.end, sub.text) for sub in pysubs2.SSAFile.from_string(text, format_=format_).events]
+
+
+def parse_srt(text, detect=True):
+    """Parse srt text into list of SSAEvent"""
+    SSAEvent = pysubs2.ssaevent.SSAEvent
+    return [SSAEvent(start=start, end=end, text=text) for start, end, text in parse_srt_fields(text, detect)]
+
+
+def is_srt_content(text):
+    """Check if pysubs2 detects text as srt"""
+    try:
+        return pysubs2.formats.autodetect_format(text[:10000]) == 'srt'
+    except pysubs2.exceptions.FormatAutodetectionError:
+        return False
+
+
+def format_srt_tags(text, style_names):
+    """
+    Convert override tags to srt html tags the same way as pysubs2 with
+    plain styles, None for drawing which pysubs2 skips
+    """
+    fragments = SSA_OVERRIDE.split(text)
+    body = [fragments[0]]
+    italic = underline = strikeout = drawing = False
+    for override, fragment in zip(SSA_OVERRIDE.findall(text), fragments[1:]):
+        for tag in SSA_STYLE_OVERRIDE.findall(override):
+            if tag[1] == 'r':
+                if tag == '\\r' or tag[2:] in style_names:
+                    italic = underline = strikeout = drawing = False
+            elif tag[1] == 'i':
+                italic = tag[2] == '1'
+            elif tag[1] == 'u':
+                underline = tag[2] == '1'
+            elif tag[1] == 's':
+                strikeout = tag[2] == '1'
+            elif tag[1] == 'p':
+                drawing = tag[2] != '0'
+        if drawing:
+            return None
+        if italic:
+            fragment = '<i>' + fragment + '</i>'
+        if underline:
+            fragment = '<u>' + fragment + '</u>'
+        if strikeout:
+            fragment = '<s>' + fragment + '</s>'
+        body.append(fragment)
+    return ''.join(body)
+
+
+def dump_srt_event(sub, line_num, style_names=('Default',)):
+    """Format one event as srt block, None if pysubs2 would skip it"""
+    text = sub.text.replace('\\h', ' ').replace('\\n', '\n').replace('\\N', '\n')
+    if '{' in text:
+        text = format_srt_tags(text, style_names)
+        if text is None:
+            return None
+    text = text.strip()
+    if '\n\n' in text:
+        text = SRT_NEWLINES.sub('\n', text)
+    return (str(line_num) + '\n' + ms_to_srt_time(sub.start) + ' --> ' +
+            ms_to_srt_time(sub.end) + '\n' + text + '\n\n')
+
+
+def dump_srt_events(events, styles=None):
+    """
+    Serialize events to srt with a single join,
+    fall back to pysubs2 for italic, underline or strikeout styles
+    """
+    if styles and any(style.italic or style.underline or style.strikeout for style in styles.values()):
+        subs = pysubs2.SSAFile()
+        subs.styles = styles
+        subs.events = list(events)
+        return subs.to_string('srt')
+
+    style_names = styles.keys() if styles else ('Default',)
+    blocks = []
+    for sub in events:
+        if sub.is_comment:
+            continue
+        block = dump_srt_event(sub, len(blocks) + 1, style_names)
+        if block is not None:
+            blocks.append(block)
+    return ''.join(blocks)
+
+
+class SubtitleEvent:
+    """View of one event of SubtitleTrack"""
+    __slots__ = ('track', 'index')
+    is_comment = False
+    style = 'Default'
+
+    def __init__(self, track, index):
+        self.track = track
+        self.index = index
+
+    @property
+    def start(self):
+        return self.track.starts[self.index]
+
+    @start.setter
+    def start(self, value):
+        self.track.starts[self.index] = value
+
+    @property
+    def end(self):
+        return self.track.ends[self.index]
+
+    @end.setter
+    def end(self, value):
+        self.track.ends[self.index] = value
+
+    @property
+    def text(self):
+        return self.track.texts[self.index]
+
+    @text.setter
+    def text(self, value):
+        self.track.texts[self.index] = sys.intern(value)
+
+    def __repr__(self):
+        return f'<SubtitleEvent start={self.start} end={self.end} text={self.text!r}>'
 
-def file_create(str_name_file, str_data):
-    """Create a file with some data"""
-    with open(str_name_file, 'w', encoding='utf-8') as f:
-        f.writelines(str(str_data))
+
+class SubtitleTrack:
+    """
+    Compact subtitle track, start and end times are kept in array('i')
+    columns and repeated texts share one interned string
+    """
+    __slots__ = ('starts', 'ends', 'texts')
+
+    def __init__(self, starts=(), ends=(), texts=()):
+        self.starts = array('i', starts)
+        self.ends = array('i', ends)
+        self.texts = [sys.intern(text) for text in texts]
+
+    @classmethod
+    def from_fields(cls, fields):
+        """Build track from (start, end, text)"""
+        return cls(*zip(*fields)) if fields else cls()
+
+    @classmethod
+    def from_events(cls, events):
+        """Build track from SSAEvent, skip comments"""
+        return cls.from_fields([(sub.start, sub.end, sub.text) for sub in events if not sub.is_comment])
+
+    @classmethod
+    def from_srt(cls, text):
+        """Build track from srt text without creating SSAEvent"""
+        return cls.from_fields(parse_srt_fields(text))
+
+    @classmethod
+    def load(cls, file_name):
+        """Load track of subtitle file"""
+        if Path(file_name).suffix == '.srt':
+            return cls.from_srt(read_text_file(file_name))
+        return cls.from_events(load_subtitle(file_name))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return type(self)(self.starts[index], self.ends[index], self.texts[index])
+        return SubtitleEvent(self, range(len(self))[index])
+
+    def __iter__(self):
+        return (SubtitleEvent(self, index) for index in range(len(self)))
+
+    def is_sorted(self):
+        """Check if events are sorted time-wise"""
+        starts, ends = self.starts, self.ends
+        return all((starts[i - 1], ends[i - 1]) <= (starts[i], ends[i]) for i in range(1, len(starts)))
+
+    def sort(self):
+        """Sort events time-wise in place, keep order of equal times"""
+        if not self.is_sorted():
+            order = sorted(range(len(self)), key=lambda i: (self.starts[i], self.ends[i]))
+            self.starts = array('i', [self.starts[i] for i in order])
+            self.ends = array('i', [self.ends[i] for i in order])
+            self.texts = [self.texts[i] for i in order]
+        return self
+
+    def index(self):
+        """Build interval index of events"""
+        return IntervalIndex(self)
+
+
+class IntervalIndex:
+    """
+    Interval index of a track: events sorted by start form an implicit
+    balanced tree, the middle of every range is its node and keeps the
+    max end of the range, so stabbing and range queries skip every
+    subtree which ends too early or starts too late, O(log n + k)
+    """
+    __slots__ = ('track', 'order', 'starts', 'ends', 'max_ends')
+
+    def __init__(self, track):
+        self.track = track
+        self.order = array('i', sorted(range(len(track)), key=lambda i: (track.starts[i], track.ends[i])))
+        self.starts = array('i', [track.starts[i] for i in self.order])
+        self.ends = array('i', [track.ends[i] for i in self.order])
+        self.max_ends = array('i', self.ends)
+        self._build(0, len(self.order))
+
+    def _build(self, low, high):
+        """Fill max end of range [low, high), return it"""
+        if low >= high:
+            return -1
+        middle = (low + high) // 2
+        self.max_ends[middle] = max(self.ends[middle], self._build(low, middle), self._build(middle + 1, high))
+        return self.max_ends[middle]
+
+    def overlap(self, start, end):
+        """Get track indexes of events overlapping [start, end) ms sorted by start"""
+        found = []
+        stack = []
+        low, high = 0, len(self.starts)
+        while stack or low < high:
+            if low < high:
+                middle = (low + high) // 2
+                if self.max_ends[middle] <= start:
+                    # 整個範圍都在 start 前結束
+                    low = high
+                    continue
+                stack.append((middle, high))
+                high = middle
+            else:
+                middle, high = stack.pop()
+                if self.starts[middle] >= end:
+                    # 依開始時間走訪，之後的都不早於 end
+                    break
+                if self.ends[middle] > start:
+                    found.append(self.order[middle])
+                low = middle + 1
+        return found
+
+    def at(self, ms):
+        """Get track indexes of events on screen at ms"""
+        return self.overlap(ms, ms + 1)
 
 
 def read_text_file(str_name_file):
@@ -706,56 +2314,356 @@ def read_text_file(str_name_file):
         return f.read()
 
 
-def ass_to_srt(str_name_file):
-    """Convert vtt file to a srt file"""
-    file_contents: str = read_text_file(str_name_file)
-    str_data: str = ""
-    if Path(str_name_file).suffix == '.ssa':
-        str_data = str_data + convert_ass_content(file_contents, '.ssa')
-    else:
-        str_data = str_data + convert_ass_content(file_contents, '.ass')
-    os.remove(str_name_file)
-    str_name_file: str = str(Path(
-        str_name_file).parent) + '/' + rename_subtitle(str_name_file)
-    file_create(str_name_file, str_data)
-    format_subtitle(str_name_file)
-    print(os.path.basename(str_name_file) + "\t...轉檔完成")
+def read_srt(file_name):
+    """Read events of srt file"""
+    return parse_srt(read_text_file(file_name))
 
-    return str_name_file
 
+def read_ass(file_name):
+    """Read events of ass/ssa file"""
+    return convert_ass_content(read_text_file(file_name))
+
+
+def read_vtt(file_name):
+    """Read events of vtt file"""
+    return parse_srt(convert_vtt_content(read_text_file(file_name)), detect=False)
+
+
+def read_xml(file_name):
+    """Read events of xml file, which may be <dia> xml or ttml"""
+    if is_ttml(file_name):
+        return read_ttml(file_name)
+    return list(convert_xml_content(file_name))
+
+
+def read_ttml(file_name):
+    """Read events of ttml/dfxp file"""
+    return list(convert_ttml_content(file_name))
+
+
+SUBTITLE_READERS = {
+    '.srt': read_srt,
+    '.ass': read_ass,
+    '.ssa': read_ass,
+    '.vtt': read_vtt,
+    '.xml': read_xml,
+    '.ttml': read_ttml,
+    '.dfxp': read_ttml,
+}
+
+
+def load_subtitle(file_name):
+    """Parse subtitle file once into list of SSAEvent"""
+    return SUBTITLE_READERS[Path(file_name).suffix](file_name)
+
+
+def dump_pysubs2(events, format_):
+    """Serialize events with pysubs2"""
+    subs = pysubs2.SSAFile()
+    subs.events.extend(events)
+    return subs.to_string(format_)
+
+
+def dump_srt(events):
+    """Serialize events to srt"""
+    return dump_srt_events(events)
+
+
+def dump_ass(events):
+    """Serialize events to ass"""
+    return dump_pysubs2(events, 'ass')
+
+
+def dump_vtt(events):
+    """Serialize events to vtt"""
+    return dump_pysubs2(events, 'vtt')
 
-def vtt_to_srt(str_name_file):
-    """Convert vtt file to a srt file"""
-    file_contents: str = read_text_file(str_name_file)
-    str_data: str = ""
-    str_data = str_data + convert_vtt_content(file_contents)
-    os.remove(str_name_file)
-    str_name_file: str = str(Path(
-        str_name_file).parent) + '/' + rename_subtitle(str_name_file)
-    file_create(str_name_file, str_data)
-    format_subtitle(str_name_file)
-    print(os.path.basename(str_name_file) + "\t...轉檔完成")
 
-    return str_name_file
+def ms_to_ttml_time(ms):
+    """Convert ms to ttml clock time"""
+    hours, ms = divmod(max(ms, 0), 3600000)
+    minutes, ms = divmod(ms, 60000)
+    seconds, ms = divmod(ms, 1000)
+    return f'{hours:02d}:{minutes:02d}:{seconds:02d}.{ms:03d}'
 
 
-def xml_to_srt(str_name_file):
-    """xml_to_srt"""
-    file_contents: str = read_text_file(str_name_file)
-    str_data: str = ""
-    subs = convert_xml_content(file_contents)
-    os.remove(str_name_file)
+def dump_ttml(events):
+    """Serialize events to ttml, {\\an8} to top region"""
+    tt = etree.Element('{http://www.w3.org/ns/ttml}tt',
+                       nsmap={None: 'http://www.w3.org/ns/ttml',
+                              'tts': 'http://www.w3.org/ns/ttml#styling'})
+    layout = etree.SubElement(etree.SubElement(tt, 'head'), 'layout')
+    for region, origin in (('top', '10% 10%'), ('bottom', '10% 80%')):
+        etree.SubElement(layout, 'region', {
+            XML_ID: region,
+            '{http://www.w3.org/ns/ttml#styling}origin': origin,
+            '{http://www.w3.org/ns/ttml#styling}extent': '80% 10%',
+            '{http://www.w3.org/ns/ttml#styling}textAlign': 'center'})
+    div = etree.SubElement(etree.SubElement(tt, 'body'), 'div')
+
+    for sub in events:
+        if sub.is_comment:
+            continue
+        region = 'top' if '\\an8' in sub.text else 'bottom'
+        text = OVERRIDE_TAGS.sub('', sub.text).replace('\\h', ' ').replace('\\n', '\\N')
+        lines = [line.strip() for line in text.split('\\N') if line.strip()]
+        if not lines:
+            continue
+        p = etree.SubElement(div, 'p', begin=ms_to_ttml_time(sub.start),
+                             end=ms_to_ttml_time(sub.end), region=region)
+        p.text = lines[0]
+        for line in lines[1:]:
+            etree.SubElement(p, 'br').tail = line
+
+    return etree.tostring(tt, encoding='UTF-8', xml_declaration=True,
+                          pretty_print=True).decode('utf-8')
+
+
+SUBTITLE_WRITERS = {
+    'srt': dump_srt,
+    'ass': dump_ass,
+    'vtt': dump_vtt,
+    'ttml': dump_ttml,
+}
+
+
+def write_subtitle(events, file_name, targets):
+    """Write the same events to every target format, return written file names"""
+    output_files = []
+    for target in targets:
+        output_file = os.path.splitext(file_name)[0] + '.' + target
+        with open(output_file, 'w', encoding='utf-8') as subtitle_file:
+            subtitle_file.write(SUBTITLE_WRITERS[target](events))
+        print(os.path.basename(output_file) + "\t...轉檔完成")
+        output_files.append(output_file)
+
+    return output_files
+
+
+def convert_segments(path, targets=None):
+    """Convert webvtt segments of a directory or a m3u8 playlist to target formats"""
+    str_name_file = get_segments_file_name(path)
     str_name_file: str = str(Path(
         str_name_file).parent) + '/' + rename_subtitle(str_name_file)
-    # subs.save(str_name_file)
-    print(os.path.basename(str_name_file) + "\t...轉檔完成")
+    return write_subtitle(list(convert_vtt_segments(path)), str_name_file, targets or ['srt'])
+
+
+def get_segments_file_name(path):
+    """Name webvtt segments after their directory or playlist"""
+    if os.path.isdir(path):
+        return os.path.normpath(path) + '.vtt'
+    return os.path.splitext(path)[0] + '.vtt'
+
 
-    return str_name_file
+def is_subtitle_member(name):
+    """Check if archive member is a subtitle, skip macOS resource forks"""
+    member = PurePosixPath(name.replace('\\', '/'))
+    return (member.suffix in SUBTITLE_FORMAT and not member.name.startswith('._')
+            and '__MACOSX' not in member.parts)
 
 
-def archive_subtitle(path, platform):
+def get_member_path(name):
+    """Relative path of archive member, drop absolute and parent parts"""
+    parts = [part for part in PurePosixPath(name.replace('\\', '/')).parts
+             if part not in ('/', '..')]
+    return '/'.join(parts)
+
+
+def get_zip_member_name(info):
+    """Decode zip member name, which is big5/gbk without utf-8 flag if zipped on Windows"""
+    if info.flag_bits & 0x800:
+        return info.filename
+    raw = info.filename.encode('cp437')
+    for codec in ('utf-8', 'cp950', 'gbk'):
+        try:
+            return raw.decode(codec)
+        except UnicodeDecodeError:
+            continue
+    return info.filename
+
+
+def read_archive(path):
+    """
+    Read subtitle members of archive in memory one by one,
+    yield (member name, bytes)
+    """
+    suffix = Path(path).suffix.lower()
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                name = get_zip_member_name(info)
+                if not info.is_dir() and is_subtitle_member(name):
+                    yield name, archive.read(info)
+    elif tarfile.is_tarfile(path):
+        with tarfile.open(path, 'r:*') as archive:
+            for member in archive:
+                if member.isfile() and is_subtitle_member(member.name):
+                    yield member.name, archive.extractfile(member).read()
+    elif suffix == '.gz':
+        name = Path(path).stem
+        if is_subtitle_member(name):
+            with gzip.open(path, 'rb') as f:
+                yield name, f.read()
+    elif suffix == '.7z':
+        if py7zr is None:
+            print("需安裝 py7zr 才能讀取 7z 壓縮檔\n")
+            return
+        with py7zr.SevenZipFile(path, 'r') as archive:
+            names = [name for name in archive.getnames() if is_subtitle_member(name)]
+            for name, data in archive.read(names).items():
+                yield name, data.read()
+    elif suffix == '.rar':
+        if rarfile is None:
+            print("需安裝 rarfile 才能讀取 rar 壓縮檔\n")
+            return
+        with rarfile.RarFile(path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and is_subtitle_member(info.filename):
+                    yield info.filename, archive.read(info)
+
+
+def handle_archive_member(args, name, data):
     """
-    Archive subtitles
+    Handle subtitle member of archive in memory,
+    return console output and list of (output name, text)
+    """
+    member_path = get_member_path(name)
+    folder = os.path.dirname(member_path)
+    folder = folder + '/' if folder else ''
+    events = parse_subtitle_content(member_path, decode_subtitle(data))
+
+    if args.clip:
+        start, end = parse_time_arg(args.clip[0]), parse_time_arg(args.clip[1])
+        clipped = clip_events(events, start, end)
+        output_name = folder + os.path.splitext(rename_subtitle(member_path))[0] + '-clip.srt'
+        return '\n擷取片段：' + ms_to_srt_time(start) + ' --> ' + ms_to_srt_time(end) + '\n' + \
+            os.path.basename(output_name) + '\t...擷取完成（' + str(len(clipped)) + ' 行）\n\n', \
+            [(output_name, dump_srt(clipped))]
+
+    if args.at:
+        return format_events_at(member_path, SubtitleTrack.from_events(events).sort(), parse_time_arg(args.at)), []
+
+    retime_map = get_retime_map(args)
+    if retime_map:
+        events = [sub for sub in events if not sub.is_comment]
+        retime_events(events, retime_map)
+        return '\n字幕重新計時：\n' + format_retime_map(retime_map) + '\n\n', \
+            [(folder + rename_subtitle(member_path), dump_srt(events))]
+
+    if args.format or args.shift:
+        subs = pysubs2.SSAFile()
+        subs.events.extend(events)
+        console = ''
+        if args.shift:
+            console = '\n字幕平移：' + str(float(args.shift)) + ' 秒\n\n'
+            after = parse_time_arg(args.after) if args.after else None
+            for sub in subs:
+                if after is None or sub.start >= after:
+                    sub.shift(s=float(args.shift))
+        return console, [(folder + rename_subtitle(member_path), dump_srt(subs.events))]
+
+    if args.convert:
+        base_name = folder + os.path.splitext(rename_subtitle(member_path))[0]
+        outputs = [(base_name + '.' + target, SUBTITLE_WRITERS[target](events))
+                   for target in get_convert_targets(args)]
+        return ''.join(os.path.basename(output_name) + "\t...轉檔完成\n"
+                       for output_name, _ in outputs), outputs
+
+    subs = pysubs2.SSAFile()
+    subs.events.extend(events)
+    if args.translate == 's':
+        converter = get_opencc()
+        for sub in subs:
+            sub.text = converter.convert(sub.text)
+    _, new_file_name = get_translated_file_name(member_path)
+    outputs, console = get_translate_outputs(new_file_name, fix_events(subs))
+    return console, [(folder + output_name, text) for output_name, text in outputs]
+
+
+def run_archive_members(args, members, jobs):
+    """
+    Handle archive members in a process pool as they are read,
+    yield (console output, outputs) of each member in order
+    """
+    if jobs <= 1:
+        for name, data in members:
+            yield handle_archive_member(args, name, data)
+        return
+
+    with worker_pool(jobs) as executor:
+        # 限制讀進記憶體、尚未處理完的成員數量
+        running = deque()
+        for name, data in members:
+            running.append(executor.submit(handle_archive_member, args, name, data))
+            if len(running) >= jobs * 2:
+                yield running.popleft().result()
+        while running:
+            yield running.popleft().result()
+
+
+def handle_archive(args, path):
+    """
+    Handle subtitles of archive in memory without extracting, write results
+    to a folder named after the archive, or into a zip with --output-archive
+    """
+    if args.merge:
+        print("壓縮檔不支援合併字幕\n")
+        return
+    if args.bilingual or args.sync_to:
+        print("壓縮檔不支援雙語字幕與自動校正時間\n")
+        return
+    if args.clip and parse_time_arg(args.clip[1]) <= parse_time_arg(args.clip[0]):
+        print('結束時間需晚於開始時間\n')
+        return
+    if args.convert:
+        get_convert_targets(args)
+
+    results = run_archive_members(args, read_archive(path),
+                                  int(args.jobs or os.cpu_count()))
+
+    compress_level = int(args.compress_level or ZIP_COMPRESS_LEVEL)
+    if args.output_archive:
+        entries = []
+        for console, outputs in results:
+            print(console, end='')
+            entries.extend((output_name, text.encode('utf-8')) for output_name, text in outputs)
+        write_zip(args.output_archive, entries, compress_level)
+        return
+
+    # 單一字幕的 .gz 解到同一層，其他解到以壓縮檔命名的資料夾
+    output_path = ARCHIVE_SUFFIX.sub('', path)
+    if Path(output_path).suffix in SUBTITLE_FORMAT:
+        output_path = os.path.dirname(path)
+    entries = {}
+    for console, outputs in results:
+        print(console, end='')
+        for output_name, text in outputs:
+            output_file = os.path.join(output_path, output_name)
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write(text)
+            if output_name.endswith('.srt'):
+                entries[os.path.basename(output_name)] = text.encode('utf-8')
+
+    # 直接打包記憶體中的結果，不再讀回剛寫出的 srt
+    if args.zip and entries:
+        archive_subtitle(output_path, args.zip, entries.items(), compress_level)
+
+
+def write_zip(file_name, entries, compress_level=ZIP_COMPRESS_LEVEL):
+    """Write (name, bytes) entries to zip sorted by name with a fixed time"""
+    with zipfile.ZipFile(file_name, 'w') as archive:
+        for name, data in sorted(entries):
+            info = zipfile.ZipInfo(name, ZIP_DATE_TIME)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            archive.writestr(info, data, compresslevel=compress_level)
+
+
+def archive_subtitle(path, platform, entries=None, compress_level=ZIP_COMPRESS_LEVEL):
+    """
+    Archive subtitles, entries are (name, bytes) already in memory,
+    default to srt files of path
     """
     platforms = [{'id': 'nf', 'name': 'Netflix'},
                  {'id': 'kktv', 'name': 'KKTV'},
@@ -765,11 +2673,12 @@ def archive_subtitle(path, platform):
     platform = next(item for item in platforms if item['id'] == platform)['name']
 
     print("\n將srt封裝打包：\n---------------------------------------------------------------")
-    zipname = path.replace(' ', '\\ ') + '.WEB-DL.' + \
-        platform + '.zh-Hant.zip '
+    zipname = path.rstrip(os.sep) + '.WEB-DL.' + platform + '.zh-Hant.zip'
     print(zipname)
-    os.system('python3 -m zipfile -c ' + zipname +
-              path.replace(' ', '\\ ') + '/*.srt')
+    if entries is None:
+        entries = [(entry.name, Path(entry.path).read_bytes()) for entry in os.scandir(path)
+                   if entry.is_file() and entry.name.endswith('.srt')]
+    write_zip(zipname, entries, compress_level)
 
 
 def walk_dir(top_most_path, args):
@@ -777,17 +2686,748 @@ def walk_dir(top_most_path, args):
     Walk a directory
     """
 
-    for f in os.listdir(top_most_path):
-        pathname = os.path.join(top_most_path, f)
-        if Path(pathname).suffix in SUBTITLE_FORMAT:
-            handle_subtitle(args, pathname)
+    subtitles = scan_dir(top_most_path, args.include, args.exclude, get_max_depth(args))
+
+    summary = {'skipped': 0, 'processed': 0}
+    skipped_outputs = []
+    if args.incremental:
+        manifests = {}
+        fingerprint = get_rule_fingerprint(args)
+        subtitles = skip_up_to_date(subtitles, manifests, fingerprint, summary, skipped_outputs)
+
+    if args.use_async:
+        results = asyncio.run(run_async(args, subtitles, int(args.jobs or os.cpu_count())))
+    elif args.jobs and int(args.jobs) > 1:
+        results = run_jobs(args, subtitles, int(args.jobs))
+    else:
+        results = ((subtitle, *handle_subtitle_outputs(args, subtitle)) for subtitle in subtitles)
+
+    entries = {}
+
+    def collect(output_data):
+        # 只打包處理結果的 srt，邊處理邊收集，不必事後再掃描資料夾
+        for output_file, data in output_data:
+            name = PurePosixPath(*Path(os.path.relpath(output_file, top_most_path)).parts)
+            entries[str(name)] = data
+
+    for subtitle, output_files, output_data in results:
+        summary['processed'] += 1
+        if args.incremental:
+            # manifest 留在記憶體，全部處理完再一次保存
+            update_manifest(subtitle, output_files, manifests, fingerprint, save=False)
+        collect(output_data)
+    if args.zip:
+        # 增量處理略過的檔案，打包它們上次的結果
+        collect(read_srt_outputs(skipped_outputs))
+
+    if args.incremental:
+        # 保存只有 mtime 變動的記錄，下次不必再計算雜湊
+        for directory, manifest in manifests.items():
+            if manifest['files']:
+                save_manifest(directory, manifest)
+        print('{0: <15}'.format("略過檔案：" + str(summary['skipped'])) +
+              '{0: <15}'.format("處理檔案：" + str(summary['processed'])) + '\n')
 
     if args.zip:
-        archive_subtitle(top_most_path, args.zip)
+        archive_subtitle(top_most_path, args.zip, list(entries.items()),
+                         compress_level=int(args.compress_level or ZIP_COMPRESS_LEVEL))
+
+
+def get_rule_fingerprint(args):
+    """Fingerprint of dictionary tables, tool source and options which change the output"""
+    rules = repr((dictionary.CONTEXT, dictionary.TYPO, dictionary.NUMBER,
+                  args.translate, args.convert, args.format, args.shift, args.after,
+                  args.fps, args.sync, args.offsets, args.sync_to, args.drift,
+                  args.merge, args.merge_offsets, args.merge_output,
+                  args.bilingual, args.bilingual_format, args.layout, args.unmatched, args.clip, args.at))
+    fingerprint = hashlib.sha256(rules.encode('utf-8'))
+    fingerprint.update(Path(__file__).read_bytes())
+    return fingerprint.hexdigest()
+
+
+def get_file_hash(file_name):
+    """Get sha256 of file"""
+    file_hash = hashlib.sha256()
+    with open(file_name, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def get_file_record(file_name, fingerprint, output_files):
+    """Record size, mtime and hash of file"""
+    stat = os.stat(file_name)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'sha256': get_file_hash(file_name),
+            'fingerprint': fingerprint, 'outputs': output_files}
+
+
+def load_manifest(directory, manifests):
+    """Load manifest of directory once"""
+    if directory not in manifests:
+        try:
+            with open(os.path.join(directory, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+                manifests[directory] = json.load(f)
+        except (OSError, ValueError):
+            manifests[directory] = {'files': {}}
+    return manifests[directory]
+
+
+def save_manifest(directory, manifest):
+    """Save manifest of directory"""
+    with open(os.path.join(directory, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+
+def is_file_unchanged(file_name, record):
+    """Compare size and mtime first, hash only if mtime changed but size did not"""
+    try:
+        stat = os.stat(file_name)
+    except OSError:
+        return False
+
+    if stat.st_size != record['size']:
+        return False
+    if stat.st_mtime_ns == record['mtime_ns']:
+        return True
+    if get_file_hash(file_name) != record['sha256']:
+        return False
+
+    record['mtime_ns'] = stat.st_mtime_ns
+    return True
+
+
+def is_up_to_date(subtitle, manifests, fingerprint):
+    """Check if subtitle and its outputs are unchanged since last run with the same rules"""
+    directory = os.path.dirname(os.path.abspath(subtitle))
+    files = load_manifest(directory, manifests)['files']
+    record = files.get(os.path.basename(subtitle))
+    if not record or record['fingerprint'] != fingerprint \
+            or not is_file_unchanged(subtitle, record):
+        return False
+
+    for output_file in record['outputs']:
+        if output_file not in files \
+                or not is_file_unchanged(os.path.join(directory, output_file), files[output_file]):
+            return False
+    return True
+
+
+def skip_up_to_date(subtitles, manifests, fingerprint, summary, skipped_outputs=None):
+    """Yield subtitles which are new or changed, collect outputs of skipped ones if a list is given"""
+    for subtitle in subtitles:
+        if is_up_to_date(subtitle, manifests, fingerprint):
+            summary['skipped'] += 1
+            if skipped_outputs is not None:
+                directory = os.path.dirname(os.path.abspath(subtitle))
+                record = load_manifest(directory, manifests)['files'][os.path.basename(subtitle)]
+                # 輸出覆蓋原檔時，記錄裡沒有其他輸出，原檔本身就是結果
+                skipped_outputs.append(subtitle)
+                skipped_outputs.extend(os.path.join(directory, output_file) for output_file in record['outputs'])
+        else:
+            yield subtitle
+
+
+def update_manifest(subtitle, output_files, manifests, fingerprint, save=True):
+    """
+    Record subtitle and its outputs in manifest of its directory,
+    save the manifest right away if save is set
+    """
+    directory = os.path.dirname(os.path.abspath(subtitle))
+    manifest = load_manifest(directory, manifests)
+
+    names = []
+    for output_file in output_files or []:
+        if os.path.exists(output_file) and \
+                os.path.dirname(os.path.abspath(output_file)) == directory:
+            names.append(os.path.basename(output_file))
+            manifest['files'][names[-1]] = get_file_record(output_file, fingerprint, [])
+
+    if os.path.exists(subtitle) and os.path.basename(subtitle) not in names:
+        manifest['files'][os.path.basename(subtitle)] = get_file_record(subtitle, fingerprint, names)
+
+    if save:
+        save_manifest(directory, manifest)
+
+
+def watch_dir(top_most_path, args):
+    """
+    Watch a directory, handle new or changed subtitles once they are fully written,
+    keep dictionary and OpenCC loaded between files
+    """
+    interval = float(args.interval or WATCH_INTERVAL)
+    manifests = {}
+    fingerprint = get_rule_fingerprint(args)
+    preload_worker_state(freeze=False)
+
+    print("\n監看資料夾：" + top_most_path + "\n---------------------------------------------------------------")
+    last_states = {}
+    failed = {}
+    try:
+        while True:
+            states = {}
+            pending = []
+            for subtitle in scan_dir(top_most_path, args.include, args.exclude, get_max_depth(args)):
+                try:
+                    stat = os.stat(subtitle)
+                except OSError:
+                    continue
+                states[subtitle] = (stat.st_size, stat.st_mtime_ns)
+
+                # 大小與修改時間在兩次輪詢間都沒變，才視為寫入完成
+                if last_states.get(subtitle) != states[subtitle] \
+                        or failed.get(subtitle) == states[subtitle] \
+                        or time.time() - stat.st_mtime < WATCH_SETTLE:
+                    continue
+                if not is_up_to_date(subtitle, manifests, fingerprint):
+                    pending.append((stat.st_size, stat.st_mtime_ns, subtitle))
+            last_states = states
+
+            # 小檔案優先，處理完這次輪詢找到的檔案再重新掃描
+            for _, _, subtitle in sorted(pending):
+                if not os.path.exists(subtitle):
+                    continue
+                start = time.perf_counter()
+                try:
+                    output_files = handle_subtitle(args, subtitle)
+                except (SystemExit, Exception) as error:
+                    print(os.path.basename(subtitle) + " 處理失敗：" + repr(error) + "\n")
+                    failed[subtitle] = states.get(subtitle)
+                    continue
+                update_manifest(subtitle, output_files, manifests, fingerprint)
+                print(os.path.basename(subtitle) + '\t...處理完成（' +
+                      f'{time.perf_counter() - start:.2f}' + ' 秒）\n')
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\n停止監看\n")
+
+
+def get_max_depth(args):
+    """Get max depth of directory scan, None for no limit"""
+    if args.max_depth:
+        return int(args.max_depth)
+    if args.recursive:
+        return None
+    return 0
+
+
+def load_rule_tables(dictionary_file=None):
+    """Load translate tables of dictionary, or of an older dictionary.py"""
+    module = dictionary
+    if dictionary_file:
+        spec = importlib.util.spec_from_file_location('old_dictionary', dictionary_file)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return {name: dict(getattr(module, name)) for name in RULE_TABLES}
+
+
+def get_rule_substrings(tables):
+    """Get keys replaced by translate tables, skip one-character keys"""
+    substrings = set()
+    for table in tables.values():
+        substrings.update(key for key in table if len(key) > 1)
+    return substrings
+
+
+def diff_rules(old_tables, new_tables):
+    """Get keys of rules which are added, removed or changed"""
+    substrings = set()
+    for name in RULE_TABLES:
+        old_table = old_tables.get(name, {})
+        new_table = new_tables.get(name, {})
+        for key in old_table.keys() | new_table.keys():
+            if old_table.get(key) != new_table.get(key):
+                substrings.add(key)
+    substrings.discard('')
+    return substrings
+
+
+def index_file(file_name, substrings):
+    """Find event numbers of each dictionary substring in event text of file"""
+    try:
+        texts = [sub.text for sub in parse_subtitle_content(file_name, read_subtitle_content(file_name))]
+    except Exception as error:
+        print(os.path.basename(file_name) + " 無法讀取：" + repr(error) + "\n")
+        return {}
+
+    text = '\n'.join(texts)
+    found = [substring for substring in substrings if substring in text]
+    if not found:
+        return {}
+
+    return {substring: [i + 1 for i, line in enumerate(texts) if substring in line]
+            for substring in found}
+
+
+def load_rule_index(top_most_path):
+    """Load dictionary index of directory"""
+    try:
+        with open(os.path.join(top_most_path, INDEX_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_rule_index(top_most_path, index):
+    """Save dictionary index of directory"""
+    with open(os.path.join(top_most_path, INDEX_NAME), 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+
+
+def add_to_rule_index(index, top_most_path, file_name, substrings):
+    """Index one file, replacing its previous entries"""
+    relative_path = os.path.relpath(file_name, top_most_path)
+    if relative_path not in index['files']:
+        index['files'].append(relative_path)
+    for substring, lines in index_file(file_name, substrings).items():
+        if lines:
+            index['keys'].setdefault(substring, {})[relative_path] = lines
+
+
+def remove_from_rule_index(index, relative_paths):
+    """Remove files from dictionary index"""
+    index['files'] = [relative_path for relative_path in index['files']
+                      if relative_path not in relative_paths]
+    for files in index['keys'].values():
+        for relative_path in relative_paths:
+            files.pop(relative_path, None)
+    index['keys'] = {substring: files for substring, files in index['keys'].items() if files}
+
+
+def build_rule_index(top_most_path, args):
+    """Index which files and lines contain which dictionary substrings"""
+    print("\n建立字典索引：\n---------------------------------------------------------------")
+    tables = load_rule_tables()
+    substrings = get_rule_substrings(tables)
+    index = {'rules': tables, 'files': [], 'keys': {}}
+    for subtitle in scan_dir(top_most_path, args.include, args.exclude, get_max_depth(args)):
+        add_to_rule_index(index, top_most_path, subtitle, substrings)
+    save_rule_index(top_most_path, index)
+    print('{0: <15}'.format("索引檔案：" + str(len(index['files']))) +
+          '{0: <15}'.format("字詞：" + str(len(index['keys']))) + '\n')
+
+
+def reprocess_rule_changes(top_most_path, args):
+    """
+    Diff dictionary against the indexed (or given) version,
+    reprocess only files containing changed rules
+    """
+    index = load_rule_index(top_most_path)
+    if not index:
+        print(top_most_path + " 尚未建立字典索引，請先執行 --build-index\n")
+        sys.exit()
+
+    if args.update_rules is True:
+        old_tables = index['rules']
+    else:
+        old_tables = load_rule_tables(args.update_rules)
+    new_tables = load_rule_tables()
+    changed = diff_rules(old_tables, new_tables)
+
+    affected = {}
+    indexed = get_rule_substrings(index['rules'])
+    for substring in changed & indexed:
+        for relative_path, lines in index['keys'].get(substring, {}).items():
+            affected.setdefault(relative_path, set()).update(lines)
+
+    # 新增的字詞不在索引中，直接搜尋已索引的檔案
+    unknown = changed - indexed
+    if unknown:
+        for relative_path in index['files']:
+            file_name = os.path.join(top_most_path, relative_path)
+            if os.path.exists(file_name):
+                for lines in index_file(file_name, unknown).values():
+                    if lines:
+                        affected.setdefault(relative_path, set()).update(lines)
+
+    print("\n字典變更：" + str(len(changed)) + " 個字詞，影響 " + str(len(affected)) +
+          " 個檔案\n---------------------------------------------------------------")
+    for relative_path in sorted(affected):
+        print(relative_path + '\t第 ' + ', '.join(map(str, sorted(affected[relative_path]))) + ' 行')
+
+    substrings = get_rule_substrings(new_tables)
+    for relative_path in sorted(affected):
+        subtitle = os.path.join(top_most_path, relative_path)
+        remove_from_rule_index(index, [relative_path])
+        for output_file in handle_subtitle(args, subtitle) or []:
+            remove_from_rule_index(index, [os.path.relpath(output_file, top_most_path)])
+            add_to_rule_index(index, top_most_path, output_file, substrings)
+
+    index['rules'] = new_tables
+    save_rule_index(top_most_path, index)
+
+
+def match_glob(name, relative_path, patterns):
+    """Check if file name or path relative to the scanned directory matches any glob pattern"""
+    return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(relative_path, pattern)
+               for pattern in patterns)
+
+
+def scan_dir(top_most_path, include=None, exclude=None, max_depth=0):
+    """
+    Scan subtitles of a directory with os.scandir, recurse into sub-directories
+    up to max_depth (None for no limit), yield each subtitle as soon as it is found
+    """
+    stack = [(top_most_path, 0)]
+    while stack:
+        path, depth = stack.pop()
+        try:
+            with os.scandir(path) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name)
+        except OSError as error:
+            print(path + " 無法讀取：" + str(error) + "\n")
+            continue
+
+        sub_dirs = []
+        for entry in entries:
+            relative_path = os.path.relpath(entry.path, top_most_path)
+            if exclude and match_glob(entry.name, relative_path, exclude):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                if max_depth is None or depth < max_depth:
+                    sub_dirs.append(entry.path)
+            elif os.path.splitext(entry.name)[1] in SUBTITLE_FORMAT:
+                if not include or match_glob(entry.name, relative_path, include):
+                    yield entry.path
+
+        stack.extend((sub_dir, depth + 1) for sub_dir in reversed(sub_dirs))
+
+
+def is_translating(args):
+    """Check if subtitles are only translated, without any other mode"""
+    return not (args.format or args.convert or args.shift or args.merge or
+                get_retime_map(args) or args.sync_to or args.bilingual or args.clip or args.at)
+
+
+def read_srt_outputs(output_files):
+    """Read (output file, bytes) of srt outputs already on disk"""
+    return [(output_file, Path(output_file).read_bytes()) for output_file in output_files
+            if output_file.endswith('.srt') and os.path.exists(output_file)]
+
+
+def handle_subtitle_outputs(args, subtitle):
+    """
+    Handle subtitle, return output files and (output file, bytes) of srt
+    outputs to zip, translated subtitles are zipped straight from memory
+    """
+    if not args.zip:
+        return handle_subtitle(args, subtitle), []
+    if is_translating(args):
+        result = translate_content(subtitle, read_subtitle_content(subtitle), args.translate == 's')
+        output_file, console = write_translate_result(subtitle, result, Path(subtitle).suffix == '.srt')
+        print(console, end='')
+        return [output_file], [(output_file, result['subtitle'].encode('utf-8'))]
+    # 其他模式的輸出由各自的函式寫檔，在處理該檔的程序中讀回
+    output_files = handle_subtitle(args, subtitle)
+    return output_files, read_srt_outputs(output_files)
+
+
+def handle_subtitle_job(args, subtitle):
+    """
+    Handle subtitle in a worker process,
+    return its console output, output files and srt data to zip
+    """
+    output = io.StringIO()
+    output_files, output_data = [], []
+    with contextlib.redirect_stdout(output):
+        try:
+            output_files, output_data = handle_subtitle_outputs(args, subtitle)
+        except SystemExit:
+            pass
+    return output.getvalue(), output_files, output_data
+
+
+@contextlib.contextmanager
+def worker_pool(jobs):
+    """
+    Process pool forked from warm worker state when fork is available,
+    every worker is started before the caller can start any thread,
+    unfreeze the garbage collector once the pool is shut down
+    """
+    context = None
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+        preload_worker_state()
+
+    try:
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=context) as executor:
+            # 先 fork 出所有 worker，之後不再從多執行緒的程序中 fork
+            list(executor.map(warm_up_worker, range(jobs)))
+            yield executor
+    finally:
+        gc.unfreeze()
+
+
+def run_jobs(args, subtitles, jobs):
+    """
+    Handle subtitles in a process pool as they are found, largest file first,
+    print console output and yield (subtitle, output files, srt data to zip)
+    of each file in order
+    """
+    with worker_pool(jobs) as executor:
+        pending = []
+        order = deque()
+        futures = {}
+        running = set()
+
+        def submit():
+            running.difference_update([future for future in running if future.done()])
+            while pending and len(running) < jobs * 2:
+                subtitle = heapq.heappop(pending)[2]
+                futures[subtitle] = executor.submit(handle_subtitle_job, args, subtitle)
+                running.add(futures[subtitle])
+
+        def finished():
+            while order and order[0] in futures and futures[order[0]].done():
+                subtitle = order.popleft()
+                output, output_files, output_data = futures.pop(subtitle).result()
+                print(output, end='')
+                yield subtitle, output_files, output_data
+
+        # 邊掃描邊處理：已找到的檔案中，先處理最大的
+        for index, subtitle in enumerate(subtitles):
+            heapq.heappush(pending, (-os.path.getsize(subtitle), index, subtitle))
+            order.append(subtitle)
+            submit()
+            yield from finished()
+
+        while pending or running:
+            if running:
+                wait(running, return_when=FIRST_COMPLETED)
+            submit()
+            yield from finished()
+        yield from finished()
+
+
+def read_subtitle_content(subtitle):
+    """Read and decode subtitle in memory"""
+    return decode_subtitle(Path(subtitle).read_bytes())
+
+
+def decode_subtitle(data):
+    """Decode subtitle bytes, fall back to detected codec"""
+    try:
+        return data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        from_codec = detect(data)['encoding'] or 'utf-8'
+        if from_codec in ('BIG5', 'GB2312'):
+            from_codec = 'CP950'
+        return data.decode(from_codec, errors='replace')
+
+
+def parse_subtitle_content(file_name, content):
+    """Parse decoded subtitle into list of SSAEvent"""
+    extension = Path(file_name).suffix
+    if extension in ('.ass', '.ssa'):
+        return convert_ass_content(content)
+    if extension == '.vtt':
+        return parse_srt(convert_vtt_content(content), detect=False)
+    if extension == '.srt':
+        return parse_srt(content)
+    if extension in ('.xml', '.ttml', '.dfxp'):
+        # 已解碼，去掉宣告的編碼再交給 lxml
+        source = io.BytesIO(XML_DECLARATION.sub('', content, count=1).encode('utf-8'))
+        if extension == '.xml' and not TTML_ROOT.search(content[:2048]):
+            return list(convert_xml_content(source))
+        return list(convert_ttml_content(source))
+    return load_subtitle(file_name)
+
+
+def translate_content(file_name, content, is_simplified):
+    """Translate decoded subtitle in a worker process"""
+    subs = pysubs2.SSAFile()
+    subs.events.extend(parse_subtitle_content(file_name, content))
+    if is_simplified:
+        converter = get_opencc()
+        for sub in subs:
+            sub.text = converter.convert(sub.text)
+    return fix_events(subs)
+
+
+async def run_async(args, subtitles, jobs):
+    """
+    Prefetch and decode next subtitles while workers translate, write outputs
+    in threads, return (subtitle, output files, srt data to zip) of each file
+    """
+    loop = asyncio.get_running_loop()
+    translating = is_translating(args)
+    prefetched = asyncio.Queue(maxsize=jobs * 2)
+    results = []
+
+    async def prefetch():
+        iterator = iter(subtitles)
+        while True:
+            subtitle = await asyncio.to_thread(next, iterator, None)
+            if subtitle is None:
+                break
+            content = None
+            if translating:
+                content = await asyncio.to_thread(read_subtitle_content, subtitle)
+            # 佇列滿了就等待，避免一次讀入整個字幕庫
+            await prefetched.put((subtitle, content))
+        for _ in range(jobs):
+            await prefetched.put(None)
+
+    async def process():
+        while True:
+            item = await prefetched.get()
+            if item is None:
+                break
+            subtitle, content = item
+            try:
+                if content is None:
+                    console, output_files, output_data = await loop.run_in_executor(
+                        executor, handle_subtitle_job, args, subtitle)
+                else:
+                    result = await loop.run_in_executor(
+                        executor, translate_content, subtitle, content, args.translate == 's')
+                    output_file, console = await asyncio.to_thread(
+                        write_translate_result, subtitle, result, Path(subtitle).suffix == '.srt')
+                    output_files = [output_file]
+                    output_data = [(output_file, result['subtitle'].encode('utf-8'))] if args.zip else []
+            except Exception as error:
+                console, output_files, output_data = \
+                    os.path.basename(subtitle) + " 處理失敗：" + repr(error) + "\n", [], []
+            print(console, end='')
+            results.append((subtitle, output_files, output_data))
+
+    with worker_pool(jobs) as executor:
+        await asyncio.gather(prefetch(), *(process() for _ in range(jobs)))
+
+    return results
+
+
+def preload_worker_state(freeze=True):
+    """
+    Build the converter and compile every regex of the fix pipeline by
+    translating small srt, ass and vtt subtitles before forking workers,
+    then move them to the permanent generation so the garbage collector
+    of each worker never writes to (and copies) the shared pages
+    """
+    translate_content('warmup.srt', WARMUP_SRT, True)
+    translate_content('warmup.ass', dump_ass(parse_srt(WARMUP_SRT)), False)
+    translate_content('warmup.vtt', WARMUP_VTT, False)
+    if freeze:
+        gc.collect()
+        gc.freeze()
+
+
+def get_process_memory():
+    """Get private and shared memory (kB) of current process"""
+    memory = {'Private': 0, 'Shared': 0}
+    try:
+        with open('/proc/self/smaps_rollup', 'r', encoding='utf-8') as f:
+            for line in f:
+                key = line.split(':')[0]
+                if key.startswith(('Private_', 'Shared_')):
+                    memory[key.split('_')[0]] += int(line.split()[1])
+    except OSError:
+        pass
+    return memory
+
+
+def warm_up_worker(_):
+    """Run dictionary translation like translate_subtitle, return pid and memory"""
+    get_opencc()
+    text = ' '.join(list(dictionary.TYPO)[:200])
+    dictionary.translate(dictionary.translate(text, dictionary.CONTEXT), dictionary.TYPO)
+    gc.collect()
+    return os.getpid(), get_process_memory()
+
+
+def measure_pool(jobs):
+    """Compare startup time and per-worker memory of worker pool modes"""
+    print("\nWorker pool 比較（" + str(jobs) + " 個 worker）：\n---------------------------------------------------------------")
+    modes = [('spawn', False), ('fork', False), ('fork', True)]
+    for start_method, freeze in modes:
+        if start_method not in multiprocessing.get_all_start_methods():
+            continue
+        if start_method == 'fork':
+            preload_worker_state(freeze)
+
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=jobs,
+                                 mp_context=multiprocessing.get_context(start_method)) as executor:
+            workers = dict(executor.map(warm_up_worker, range(jobs * 4)))
+        elapsed = time.perf_counter() - start
+        gc.unfreeze()
+
+        private = sum(memory['Private'] for memory in workers.values()) / len(workers)
+        shared = sum(memory['Shared'] for memory in workers.values()) / len(workers)
+        print('{0: <22}'.format(start_method + (' + gc.freeze' if freeze else '')) +
+              '{0: <18}'.format("啟動：" + f'{elapsed:.2f}s') +
+              '{0: <22}'.format("私有記憶體：" + f'{private:.0f}kB') +
+              "共用記憶體：" + f'{shared:.0f}kB')
+
+
+def benchmark_srt(path, args, repeat=3):
+    """
+    Compare native srt parser and serializer with pysubs2 on srt files,
+    check both give identical events and output
+    """
+    if os.path.isdir(path):
+        files = [subtitle for subtitle in scan_dir(path, args.include, args.exclude, get_max_depth(args))
+                 if Path(subtitle).suffix == '.srt']
+    else:
+        files = [path]
+
+    print("\nsrt 解析與輸出比較（" + str(len(files)) + " 個檔案）：\n---------------------------------------------------------------")
+    elapsed = {'pysubs2': [0.0, 0.0], 'native': [0.0, 0.0]}
+    line_num = 0
+    mismatches = []
+    for subtitle in files:
+        text = read_text_file(subtitle)
+        results = {}
+        for name, parse, dump in (
+                ('pysubs2', lambda: pysubs2.SSAFile.from_string(text).events, lambda events: dump_pysubs2(events, 'srt')),
+                ('native', lambda: parse_srt(text), dump_srt_events)):
+            parse_time = dump_time = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                events = parse()
+                middle = time.perf_counter()
+                output = dump(events)
+                parse_time = min(parse_time, middle - start)
+                dump_time = min(dump_time, time.perf_counter() - middle)
+            elapsed[name][0] += parse_time
+            elapsed[name][1] += dump_time
+            results[name] = ([(sub.start, sub.end, sub.text) for sub in events], output)
+
+        line_num += len(results['pysubs2'][0])
+        if results['pysubs2'] != results['native']:
+            mismatches.append(subtitle)
+
+    for name, (parse_time, dump_time) in elapsed.items():
+        print('{0: <12}'.format(name) +
+              '{0: <18}'.format("解析：" + f'{parse_time * 1000:.1f}ms') +
+              '{0: <18}'.format("輸出：" + f'{dump_time * 1000:.1f}ms'))
+    native_time = sum(elapsed['native']) or float('inf')
+    print('{0: <15}'.format("字幕行數：" + str(line_num)) +
+          "加速：" + f'{sum(elapsed["pysubs2"]) / native_time:.1f}x' + '\n')
+
+    if mismatches:
+        print("輸出不一致：")
+        for subtitle in mismatches:
+            print(subtitle)
+    else:
+        print("輸出一致\n")
+
+
+def handle_segments(args, path):
+    """Handle webvtt segments of a directory or a m3u8 playlist"""
+    if not os.path.exists(path):
+        print(path + " 檔案不存在\n")
+        sys.exit()
+
+    if args.convert:
+        convert_segments(path, get_convert_targets(args))
+    else:
+        translate_subtitle(get_segments_file_name(path),
+                           args.translate == 's', convert_vtt_segments(path))
 
 
 def handle_subtitle(args, subtitle):
-    """Handle subtitle"""
+    """Handle subtitle, return output files"""
     if not os.path.exists(subtitle):
         print(subtitle + " 檔案不存在\n")
         sys.exit()
@@ -795,20 +3435,308 @@ def handle_subtitle(args, subtitle):
     convert_utf8(subtitle)
 
     if args.format:
-        format_subtitle(subtitle)
-    elif args.convert:
-        convert_subtitle(subtitle)
-    elif args.shift:
+        return [format_subtitle(subtitle)]
+    if args.convert:
+        return convert_subtitle(subtitle, get_convert_targets(args))
+    if args.shift:
         offset = float(args.shift)
-        shift_subtitle(subtitle, offset)
-    elif args.merge:
-        second_subtitle = args.merge
-        if Path(second_subtitle).suffix == '.srt':
-            merge_subtitle(subtitle, second_subtitle)
-    elif args.translate == 's':
-        translate_subtitle(convert_subtitle(subtitle), True)
-    elif args.translate != 's':
-        translate_subtitle(convert_subtitle(subtitle), False)
+        return [shift_subtitle(subtitle, offset, parse_time_arg(args.after) if args.after else None)]
+    retime_map = get_retime_map(args)
+    if retime_map:
+        return [retime_subtitle(subtitle, retime_map)]
+    if args.clip:
+        output_file = clip_subtitle(subtitle, parse_time_arg(args.clip[0]), parse_time_arg(args.clip[1]))
+        return [output_file] if output_file else []
+    if args.at:
+        print_events_at(subtitle, parse_time_arg(args.at))
+        return []
+    if args.bilingual:
+        output_file = bilingual_subtitle(subtitle, get_paired_subtitle(args.bilingual, subtitle),
+                                         args.bilingual_format, args.layout, args.unmatched)
+        return [output_file] if output_file else []
+    if args.sync_to:
+        output_file = auto_sync_subtitle(subtitle, get_paired_subtitle(args.sync_to, subtitle), args.drift)
+        return [output_file] if output_file else []
+    if args.merge:
+        parts = [subtitle] + [part.strip() for part in args.merge.split(',')]
+        for part in parts:
+            if Path(part).suffix not in SUBTITLE_FORMAT or not os.path.exists(part):
+                print(part + " 非字幕檔或檔案不存在\n")
+                return []
+        offsets = None
+        if args.merge_offsets:
+            offsets = [parse_time_arg(offset) for offset in args.merge_offsets.split(',')]
+            if len(offsets) != len(parts) - 1:
+                print('起始時間需與其餘分段數量相同：' + str(len(parts) - 1) + ' 個\n')
+                return []
+        return [merge_subtitle(parts, offsets, args.merge_output)]
+    if Path(subtitle).suffix == '.srt':
+        return [translate_subtitle(subtitle, args.translate == 's')]
+    return [translate_subtitle(subtitle, args.translate == 's', load_subtitle(subtitle))]
+
+
+def get_convert_targets(args):
+    """Get target formats of -c, default to srt"""
+    if args.convert is True:
+        return ['srt']
+
+    targets = [target.strip().lstrip('.').lower() for target in args.convert.split(',')]
+    for target in targets:
+        if target not in SUBTITLE_WRITERS:
+            print(target + " 不支援的字幕格式，可轉成：" + '、'.join(SUBTITLE_WRITERS) + "\n")
+            sys.exit()
+    return targets
+
+
+def guess_content_format(content):
+    """Guess format of service request content without a format or filename"""
+    head = content.lstrip('\ufeff \t\r\n')[:4096]
+    if head.startswith('<'):
+        return 'xml'
+    if head.startswith('['):
+        return 'ass'
+    return pysubs2.formats.autodetect_format(head)
+
+
+def fix_request(request):
+    """Fix subtitle content or event list of a service request"""
+    if 'events' in request:
+        subs = pysubs2.SSAFile()
+        subs.events.extend(pysubs2.ssaevent.SSAEvent(start=int(event['start']),
+                                                     end=int(event['end']),
+                                                     text=event['text'])
+                           for event in request['events'])
+    else:
+        # 與命令列相同，依副檔名交給各格式的讀取函式
+        file_name = request.get('filename') or 'request.' + (request.get('format') or
+                                                             guess_content_format(request['content']))
+        subs = pysubs2.SSAFile()
+        if Path(file_name).suffix in SUBTITLE_FORMAT:
+            subs.events.extend(parse_subtitle_content(file_name, request['content']))
+        else:
+            subs.events.extend(pysubs2.SSAFile.from_string(request['content'],
+                                                           format_=request.get('format')).events)
+
+    if request.get('simplified'):
+        converter = get_opencc()
+        for sub in subs:
+            sub.text = converter.convert(sub.text)
+
+    return fix_events(subs, request.get('output') or 'srt')
+
+
+def fix_batch(requests):
+    """Fix a batch of service requests in a worker process"""
+    results = []
+    for request in requests:
+        try:
+            results.append(fix_request(request))
+        except Exception as error:
+            results.append({'error': repr(error)})
+    return results
+
+
+class SubtitleService:
+    """Batch requests into a bounded process pool with warm dictionary and OpenCC"""
+
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self.requests = queue.Queue(SERVICE_QUEUE_SIZE)
+        self.batch_slots = threading.BoundedSemaphore(jobs * 2)
+        self.lock = threading.Lock()
+        self.metrics = {'requests': 0, 'errors': 0, 'rejected': 0, 'batches': 0,
+                        'batched_requests': 0, 'latency': 0.0}
+        self.started = time.time()
+
+        self.pool = contextlib.ExitStack()
+        self.executor = self.pool.enter_context(worker_pool(jobs))
+        gc.unfreeze()
+
+        threading.Thread(target=self.dispatch, daemon=True).start()
+
+    def submit(self, request):
+        """Queue request, raise queue.Full if service is overloaded"""
+        future = Future()
+        try:
+            self.requests.put_nowait((request, future, time.perf_counter()))
+        except queue.Full:
+            with self.lock:
+                self.metrics['rejected'] += 1
+            raise
+        return future
+
+    def dispatch(self):
+        """Collect queued requests into batches and send them to workers"""
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.perf_counter() + SERVICE_BATCH_WAIT
+            while len(batch) < SERVICE_BATCH_SIZE:
+                try:
+                    batch.append(self.requests.get(timeout=max(deadline - time.perf_counter(), 0)))
+                except queue.Empty:
+                    break
+
+            self.batch_slots.acquire()
+            future = self.executor.submit(fix_batch, [request for request, _, _ in batch])
+            future.add_done_callback(lambda done, batch=batch: self.finish(batch, done))
+
+    def finish(self, batch, done):
+        """Hand results of a batch back to waiting requests"""
+        self.batch_slots.release()
+        try:
+            results = done.result()
+        except Exception as error:
+            results = [{'error': repr(error)}] * len(batch)
+
+        now = time.perf_counter()
+        with self.lock:
+            self.metrics['batches'] += 1
+            self.metrics['batched_requests'] += len(batch)
+            for (_, future, start), result in zip(batch, results):
+                self.metrics['requests'] += 1
+                self.metrics['errors'] += 'error' in result
+                self.metrics['latency'] += now - start
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def get_metrics(self):
+        """Get service metrics"""
+        with self.lock:
+            metrics = dict(self.metrics)
+        requests = metrics.pop('batched_requests')
+        latency = metrics.pop('latency')
+        metrics.update({
+            'workers': self.jobs,
+            'queue': self.requests.qsize(),
+            'average_batch_size': round(requests / metrics['batches'], 2) if metrics['batches'] else 0,
+            'average_latency_ms': round(latency * 1000 / requests, 2) if requests else 0,
+            'uptime': round(time.time() - self.started),
+        })
+        return metrics
+
+    def close(self):
+        """Stop workers"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.pool.close()
+
+
+class SubtitleRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET  /health   service status
+    GET  /metrics  request, batch and latency counters
+    POST /fix      subtitle bytes (?format=&output=&simplified=1), or json of
+                   {"events": [{"start", "end", "text"}], ...} or a list of them
+    """
+    service = None
+
+    def send_json(self, status, data):
+        """Send json response"""
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        """Health and metrics"""
+        path = urlparse(self.path).path
+        if path == '/health':
+            self.send_json(200, {'status': 'ok'})
+        elif path == '/metrics':
+            self.send_json(200, self.service.get_metrics())
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        """Fix subtitles"""
+        url = urlparse(self.path)
+        if url.path != '/fix':
+            self.send_json(404, {'error': 'not found'})
+            return
+
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        try:
+            if 'json' in self.headers.get('Content-Type', ''):
+                requests = json.loads(body)
+            else:
+                try:
+                    content = body.decode('utf-8-sig')
+                except UnicodeDecodeError:
+                    content = body.decode(detect(body)['encoding'] or 'utf-8', errors='replace')
+                requests = {'content': content}
+        except ValueError as error:
+            self.send_json(400, {'error': repr(error)})
+            return
+
+        is_batch = isinstance(requests, list)
+        if not is_batch:
+            requests = [requests]
+        if not all(isinstance(request, dict) and ('events' in request or 'content' in request)
+                   for request in requests):
+            self.send_json(400, {'error': 'each request must be an object with events or content'})
+            return
+        for request in requests:
+            for key in ('format', 'filename', 'output'):
+                request.setdefault(key, query.get(key))
+            request.setdefault('simplified', query.get('simplified') in ('1', 's', 'true'))
+
+        try:
+            futures = [self.service.submit(request) for request in requests]
+        except queue.Full:
+            self.send_json(503, {'error': 'service busy'})
+            return
+
+        try:
+            results = [future.result(timeout=SERVICE_TIMEOUT) for future in futures]
+        except TimeoutError:
+            self.send_json(504, {'error': 'timeout'})
+            return
+        status = 400 if any('error' in result for result in results) else 200
+        self.send_json(status, results if is_batch else results[0])
+
+    def address_string(self):
+        """Client address is empty on a Unix socket"""
+        return self.client_address[0] if self.client_address else 'unix'
+
+
+class UnixHTTPServer(ThreadingHTTPServer):
+    """HTTP server on a Unix socket"""
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        """Bind socket path instead of host and port"""
+        socketserver.TCPServer.server_bind(self)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+def serve(args):
+    """Serve translate pipeline on localhost or a Unix socket"""
+    SubtitleRequestHandler.service = SubtitleService(int(args.jobs or os.cpu_count()))
+
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = UnixHTTPServer(args.socket, SubtitleRequestHandler)
+        address = args.socket
+    else:
+        port = SERVICE_PORT if args.serve is True else int(args.serve)
+        server = ThreadingHTTPServer(('127.0.0.1', port), SubtitleRequestHandler)
+        address = 'http://127.0.0.1:' + str(port)
+
+    print("\n字幕服務：" + address + "\n---------------------------------------------------------------")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n停止服務\n")
+    finally:
+        server.server_close()
+        SubtitleRequestHandler.service.close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
 
 def main():
     """
@@ -817,7 +3745,8 @@ def main():
     parser = argparse.ArgumentParser(
         description='字幕處理')
     parser.add_argument('path',
-                        help='欲修改字幕檔案的位置')
+                        nargs='*',
+                        help='欲修改字幕檔案的位置（可指定多個）')
     parser.add_argument('-t',
                         '--translate',
                         dest='translate',
@@ -829,7 +3758,7 @@ def main():
                         dest='convert',
                         nargs='?',
                         const=True,
-                        help='字幕轉成srt檔')
+                        help='字幕轉檔，可指定多個格式，如：srt,ass,vtt,ttml（預設srt）')
     parser.add_argument('-f',
                         '--format',
                         dest='format',
@@ -840,30 +3769,180 @@ def main():
                         '--shift',
                         dest='shift',
                         help='平移字幕')
+    parser.add_argument('--after',
+                        dest='after',
+                        help='只平移此時間之後的字幕，如：90 或 00:01:30,500')
+    parser.add_argument('--fps',
+                        dest='fps',
+                        help='轉換影格率，如：23.976:25')
+    parser.add_argument('--sync',
+                        dest='sync',
+                        help='以兩個同步點線性校正時間，如：00:01:00=00:01:02,01:00:00=01:00:30')
+    parser.add_argument('--offsets',
+                        dest='offsets',
+                        help='分段平移，從各時間點起平移的秒數，如：0=1.5,00:20:00=3.2')
+    parser.add_argument('--sync-to',
+                        dest='sync_to',
+                        help='依參考字幕自動校正時間，可指定資料夾依 SxxEyy 或檔名配對')
+    parser.add_argument('--drift',
+                        dest='drift',
+                        action='store_true',
+                        help='自動校正時間時一併偵測影格率造成的漂移')
     parser.add_argument('-m',
                         '--merge',
                         dest='merge',
-                        help='合併字幕')
+                        help='合併字幕，可用逗號指定多個分段，如：part2.srt,part3.srt')
+    parser.add_argument('--merge-offsets',
+                        dest='merge_offsets',
+                        help='其餘各分段的起始時間，如：00:45:00,01:30:00（預設接在前一段結束後 5 秒）')
+    parser.add_argument('--merge-output',
+                        dest='merge_output',
+                        help='合併後的檔名（預設依第一段命名）')
+    parser.add_argument('--bilingual',
+                        dest='bilingual',
+                        help='合成中英雙語字幕，指定英文字幕，可指定資料夾依 SxxEyy 或檔名配對')
+    parser.add_argument('--bilingual-format',
+                        dest='bilingual_format',
+                        choices=['srt', 'ass'],
+                        default='srt',
+                        help='雙語字幕格式（預設srt）')
+    parser.add_argument('--layout',
+                        dest='layout',
+                        choices=BILINGUAL_LAYOUTS,
+                        default='zh-en',
+                        help='雙語排版：zh-en 中文在上、en-zh 英文在上、split 英文置頂（預設zh-en）')
+    parser.add_argument('--unmatched',
+                        dest='unmatched',
+                        choices=BILINGUAL_UNMATCHED,
+                        default='keep',
+                        help='未配對的字幕：keep 全部保留、zh 只保留中文、drop 全部捨棄（預設keep）')
+    parser.add_argument('--clip',
+                        dest='clip',
+                        nargs=2,
+                        metavar=('START', 'END'),
+                        help='擷取片段並從 0 開始計時，另存新檔，如：00:10:00 00:12:30')
+    parser.add_argument('--at',
+                        dest='at',
+                        help='列出此時間畫面上的字幕，如：00:10:00,500')
     parser.add_argument('-z',
                         '--zip',
                         dest='zip',
                         help='打包字幕')
+    parser.add_argument('--compress-level',
+                        dest='compress_level',
+                        help='打包字幕的壓縮等級 0-9（預設6）')
+    parser.add_argument('--output-archive',
+                        dest='output_archive',
+                        help='處理壓縮檔時，將結果直接寫入此 zip')
+    parser.add_argument('-j',
+                        '--jobs',
+                        dest='jobs',
+                        help='同時處理的檔案數')
+    parser.add_argument('--async',
+                        dest='use_async',
+                        nargs='?',
+                        const=True,
+                        help='讀檔、寫檔與字幕處理同時進行，適合網路磁碟')
+    parser.add_argument('-r',
+                        '--recursive',
+                        dest='recursive',
+                        nargs='?',
+                        const=True,
+                        help='處理子資料夾中的字幕')
+    parser.add_argument('--max-depth',
+                        dest='max_depth',
+                        help='子資料夾最大深度')
+    parser.add_argument('--include',
+                        dest='include',
+                        action='append',
+                        help='只處理符合的檔案，如：*S01E*.srt（可重複指定）')
+    parser.add_argument('--exclude',
+                        dest='exclude',
+                        action='append',
+                        help='略過符合的檔案或資料夾，如：*.zh.srt（可重複指定）')
+    parser.add_argument('--incremental',
+                        dest='incremental',
+                        nargs='?',
+                        const=True,
+                        help='略過上次處理後未變更的檔案')
+    parser.add_argument('-w',
+                        '--watch',
+                        dest='watch',
+                        nargs='?',
+                        const=True,
+                        help='監看資料夾，自動處理新加入的字幕')
+    parser.add_argument('--interval',
+                        dest='interval',
+                        help='監看資料夾的輪詢間隔（秒）')
+    parser.add_argument('--build-index',
+                        dest='build_index',
+                        nargs='?',
+                        const=True,
+                        help='建立資料夾的字典索引')
+    parser.add_argument('--update-rules',
+                        dest='update_rules',
+                        nargs='?',
+                        const=True,
+                        help='比對字典變更（可指定舊版 dictionary.py），只重新處理受影響的檔案')
+    parser.add_argument('--serve',
+                        dest='serve',
+                        nargs='?',
+                        const=True,
+                        help='在 localhost 啟動字幕修正服務（預設 port 8000）')
+    parser.add_argument('--socket',
+                        dest='socket',
+                        help='在 Unix socket 啟動字幕修正服務')
+    parser.add_argument('--pool-stats',
+                        dest='pool_stats',
+                        nargs='?',
+                        const=True,
+                        help='比較各種 worker pool 的啟動時間與記憶體用量')
+    parser.add_argument('--benchmark-srt',
+                        dest='benchmark_srt',
+                        nargs='?',
+                        const=True,
+                        help='比較內建 srt 解析器與 pysubs2 的速度，並檢查輸出是否一致')
+    parser.add_argument('--segments',
+                        dest='segments',
+                        nargs='?',
+                        const=True,
+                        help='合併資料夾或m3u8中的WebVTT分段字幕')
 
     args = parser.parse_args()
 
-    path = args.path
-    if os.path.isdir(path):
-        walk_dir(path, args)
+    if args.pool_stats:
+        measure_pool(int(args.jobs or os.cpu_count()))
+        return
+
+    if args.serve or args.socket:
+        serve(args)
+        return
+
+    if not args.path:
+        parser.error('請指定字幕檔案或資料夾的位置')
+
+    for path in args.path:
+        handle_path(args, path)
+
+
+def handle_path(args, path):
+    """Handle a subtitle, archive or directory of command line"""
+    if args.benchmark_srt:
+        benchmark_srt(path, args)
+    elif args.segments or Path(path).suffix == '.m3u8':
+        handle_segments(args, path)
+    elif os.path.isdir(path):
+        if args.watch:
+            watch_dir(path, args)
+        elif args.build_index:
+            build_rule_index(path, args)
+        elif args.update_rules:
+            reprocess_rule_changes(path, args)
+        else:
+            walk_dir(path, args)
     else:
-        if Path(path).suffix in ARCHIVE_FORMAT:
-            extract_command = 'unar \'' + path + '\' -o ' + str(Path(path).parent)
-            result = re.search(r'Successfully extracted to "(.+?)"', subprocess.getoutput(extract_command))
-            if result:
-                output_path = result.group(1)
-                if os.path.isdir(output_path):
-                    walk_dir(output_path, args)
-                else:
-                    handle_subtitle(args, output_path)
+        if Path(path).suffix.lower() in ARCHIVE_FORMAT:
+            handle_archive(args, path)
         elif Path(path).suffix in SUBTITLE_FORMAT:
             handle_subtitle(args, path)
         else:
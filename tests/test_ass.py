@@ -0,0 +1,18 @@
+"""
+Style actions of ass events
+"""
+import subtitle_tool
+
+ASS_EVENTS = '''[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+Dialogue: 0,0:00:01.00,0:00:02.00,Caption,,0000,0000,0000,,{\\i1}標題
+Dialogue: 0,0:00:01.00,0:00:02.00,Caption,,0010,0000,0000,,有邊界的標題
+Dialogue: 0,0:00:01.00,0:00:02.00,Lyrics,,0,0,0,,歌詞
+Dialogue: 0,0:00:01.00,0:00:02.00,song,,0,0,15,,有邊界的歌詞
+Dialogue: 0,0:00:01.00,0:00:02.00,Default,,0,0,20,,一般
+'''
+
+
+def test_style_actions_only_apply_to_zero_margins():
+    assert [sub.text for sub in subtitle_tool.convert_ass_content(ASS_EVENTS)] == \
+        ['（標題）', '有邊界的標題', '{\\an8}歌詞', '有邊界的歌詞', '一般']
@@ -0,0 +1,43 @@
+"""
+Only animated fragments are coalesced before translation
+"""
+import pysubs2
+
+import subtitle_tool
+
+SRT = '''1
+00:00:06,000 --> 00:00:07,000
+好
+
+2
+00:00:07,000 --> 00:00:08,000
+好
+
+3
+00:00:08,000 --> 00:00:09,000
+走吧
+'''
+
+
+def test_repeated_srt_cues_are_kept():
+    result = subtitle_tool.translate_content('a.srt', SRT, False)
+    assert [(event['start'], event['end'], event['text']) for event in result['events']] == \
+        [(6000, 7000, '好'), (7000, 8000, '好'), (8000, 9000, '走吧')]
+
+
+def test_repeated_srt_cues_are_kept_when_streaming(tmp_path):
+    file_name = tmp_path / 'a.srt'
+    file_name.write_text(SRT, encoding='utf-8')
+    output_file = subtitle_tool.translate_subtitle(str(file_name), False)
+    assert len(pysubs2.load(output_file).events) == 3
+
+
+def test_animated_fragments_are_coalesced():
+    events = [pysubs2.SSAEvent(start=0, end=1000, text='{\\move(0,0,10,10)}標題'),
+              pysubs2.SSAEvent(start=1000, end=2000, text='{\\move(10,10,20,20)}標題'),
+              pysubs2.SSAEvent(start=2000, end=2040, text='閃'),
+              pysubs2.SSAEvent(start=2040, end=2080, text='閃'),
+              pysubs2.SSAEvent(start=3000, end=4000, text='好'),
+              pysubs2.SSAEvent(start=4000, end=5000, text='好')]
+    assert [(sub.start, sub.end) for sub in subtitle_tool.coalesce_events(events, animated_only=True)] == \
+        [(0, 2000), (2000, 2080), (3000, 4000), (4000, 5000)]
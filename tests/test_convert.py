@@ -0,0 +1,25 @@
+"""
+Converting to several formats never overwrites the source subtitle
+"""
+import subtitle_tool
+
+ASS = '''[Script Info]
+ScriptType: v4.00+
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Caption,Arial,20,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,2,2,8,10,10,10,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+Comment: 0,0:00:00.00,0:00:01.00,Caption,,0,0,0,,註解
+Dialogue: 0,0:00:01.00,0:00:02.00,Caption,,0,0,0,,{\\i1}標題
+'''
+
+
+def test_convert_keeps_relative_source(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'b.ass').write_text(ASS, encoding='utf-8')
+    assert subtitle_tool.convert_subtitle('b.ass', ['srt', 'ass']) == ['./b.srt']
+    assert (tmp_path / 'b.ass').read_text(encoding='utf-8') == ASS
+    assert '標題' in (tmp_path / 'b.srt').read_text(encoding='utf-8')
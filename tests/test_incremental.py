@@ -0,0 +1,32 @@
+"""
+Incremental directory runs save each manifest once
+"""
+import json
+import sys
+
+import subtitle_tool
+
+SRT = '1\n00:00:01,000 --> 00:00:02,000\n你好\n'
+
+save_manifest = subtitle_tool.save_manifest
+
+
+def run(tmp_path, monkeypatch, saved):
+    monkeypatch.setattr(sys, 'argv', ['subtitle_tool.py', '--incremental', '1', str(tmp_path)])
+    monkeypatch.setattr(subtitle_tool, 'save_manifest',
+                        lambda directory, manifest: saved.append(directory) or save_manifest(directory, manifest))
+    subtitle_tool.main()
+
+
+def test_manifest_is_saved_once(tmp_path, monkeypatch, capsys):
+    for index in range(5):
+        (tmp_path / f'{index}.srt').write_text(SRT, encoding='utf-8')
+    saved = []
+    run(tmp_path, monkeypatch, saved)
+    assert saved == [str(tmp_path)]
+    with open(tmp_path / subtitle_tool.MANIFEST_NAME, encoding='utf-8') as f:
+        assert sorted(json.load(f)['files']) == [f'{index}.zh.srt' for index in range(5)]
+
+    capsys.readouterr()
+    run(tmp_path, monkeypatch, saved)
+    assert '略過檔案：5' in capsys.readouterr().out
@@ -0,0 +1,41 @@
+"""
+Worker state is warmed up, then workers are forked before any other thread starts
+"""
+import os
+import sys
+import threading
+
+import pytest
+
+import subtitle_tool
+
+SRT = '1\n00:00:01,000 --> 00:00:02,000\n你好\n'
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='fork only')
+def test_async_forks_without_threads(tmp_path, monkeypatch):
+    for index in range(3):
+        (tmp_path / f'{index}.srt').write_text(SRT, encoding='utf-8')
+    fork = os.fork
+    pid = os.getpid()
+    threads = []
+
+    def record_fork():
+        if os.getpid() == pid:
+            threads.append(threading.active_count())
+        return fork()
+
+    monkeypatch.setattr(os, 'fork', record_fork)
+    monkeypatch.setattr(sys, 'argv', ['subtitle_tool.py', '-j', '2', '--async', '1', str(tmp_path)])
+    subtitle_tool.main()
+    assert threads == [1, 1]
+    assert sorted(path.name for path in tmp_path.glob('*.zh.srt')) == ['0.zh.srt', '1.zh.srt', '2.zh.srt']
+
+
+@pytest.mark.parametrize('file_name, content', [
+    ('warmup.srt', subtitle_tool.WARMUP_SRT),
+    ('warmup.ass', subtitle_tool.dump_ass(subtitle_tool.parse_srt(subtitle_tool.WARMUP_SRT))),
+    ('warmup.vtt', subtitle_tool.WARMUP_VTT),
+], ids=['srt', 'ass', 'vtt'])
+def test_warmup_yields_events(file_name, content):
+    assert subtitle_tool.translate_content(file_name, content, True)['events']
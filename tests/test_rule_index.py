@@ -0,0 +1,32 @@
+"""
+Dictionary index only records replaced keys in event text
+"""
+import subtitle_tool
+
+SRT = '''1
+00:00:01,000 --> 00:00:02,000
+你在做甚麼
+
+2
+00:00:03,000 --> 00:00:04,000
+今天 10 點
+
+3
+00:00:05,000 --> 00:00:06,000
+拿不準甚麼時候
+'''
+
+
+def test_index_keys_of_event_text(tmp_path):
+    file_name = tmp_path / 'a.srt'
+    file_name.write_text(SRT, encoding='utf-8')
+    tables = {'CONTEXT': {'甚麼': '什麼', '１': '1', '00:00': 'x'}, 'TYPO': {'拿不準': '拿不准'}}
+    substrings = subtitle_tool.get_rule_substrings(tables)
+    assert substrings == {'甚麼', '00:00', '拿不準'}
+    assert subtitle_tool.index_file(str(file_name), substrings) == {'甚麼': [1, 3], '拿不準': [3]}
+
+
+def test_diff_rules_only_keys():
+    old_tables = {'CONTEXT': {'甚麼': '什麼', '早飯': '早餐'}, 'TYPO': {}}
+    new_tables = {'CONTEXT': {'甚麼': '什麼', '早飯': '早點'}, 'TYPO': {'批準': '批准'}}
+    assert subtitle_tool.diff_rules(old_tables, new_tables) == {'早飯', '批準'}
@@ -0,0 +1,53 @@
+"""
+Service requests are parsed like the command line
+"""
+import pytest
+
+import subtitle_tool
+
+ASS = '''[Script Info]
+ScriptType: v4.00+
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,Arial,20,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,2,2,2,10,10,10,1
+Style: Lyrics,Arial,20,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,2,2,2,10,10,10,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+Comment: 0,0:00:00.00,0:00:01.00,Default,,0,0,0,,註解
+Dialogue: 0,0:00:01.00,0:00:02.00,Lyrics,,0,0,0,,歌詞
+Dialogue: 0,0:00:03.00,0:00:04.00,Default,,0,0,0,,你好
+'''
+
+VTT = 'WEBVTT\n\n00:00:01.000 --> 00:00:02.000 line:10%\n上方\n\n00:00:03.000 --> 00:00:04.000\n<i>世界</i>\n'
+
+SRT = '1\n00:00:01,000 --> 00:00:02,000\n你好\n\n2\n00:00:03,000 --> 00:00:04,000\n世界\n'
+
+
+def cli_output(tmp_path, name, content):
+    file_name = tmp_path / name
+    file_name.write_text(content, encoding='utf-8')
+    if file_name.suffix == '.srt':
+        output_file = subtitle_tool.translate_subtitle(str(file_name), False)
+    else:
+        output_file = subtitle_tool.translate_subtitle(str(file_name), False,
+                                                       subtitle_tool.load_subtitle(str(file_name)))
+    with open(output_file, encoding='utf-8') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('name, content', [('a.ass', ASS), ('a.vtt', VTT), ('a.srt', SRT)])
+@pytest.mark.parametrize('hint', ['filename', 'format', None])
+def test_service_matches_cli(tmp_path, name, content, hint):
+    request = {'content': content}
+    if hint == 'filename':
+        request['filename'] = name
+    elif hint == 'format':
+        request['format'] = name.split('.')[-1]
+    assert subtitle_tool.fix_request(request)['subtitle'] == cli_output(tmp_path, name, content)
+
+
+def test_service_uses_ass_style_table():
+    events = subtitle_tool.fix_request({'content': ASS, 'format': 'ass'})['events']
+    assert [event['text'] for event in events] == ['{\\an8}歌詞', '你好']
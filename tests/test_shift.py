@@ -0,0 +1,80 @@
+"""
+Shifting and retiming subtitles
+"""
+import subtitle_tool
+
+DIA_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<subtitle>
+<dia><st>1000</st><et>2000</et><sub>你好</sub></dia>
+<dia><st>3000</st><et>4000</et><sub>世界</sub></dia>
+</subtitle>
+'''
+
+TTML = '''<?xml version="1.0" encoding="UTF-8"?>
+<tt xmlns="http://www.w3.org/ns/ttml">
+<body><div>
+<p begin="00:00:01.000" end="00:00:02.000">你好</p>
+<p begin="00:00:03.000" end="00:00:04.000">世界</p>
+</div></body></tt>
+'''
+
+
+def timings(file_name):
+    return [(sub.start, sub.end) for sub in subtitle_tool.load_subtitle(str(file_name))]
+
+
+def test_shift_xml_keeps_source(tmp_path):
+    file_name = tmp_path / 'a.xml'
+    file_name.write_text(DIA_XML, encoding='utf-8')
+    output_file = subtitle_tool.shift_subtitle(str(file_name), 1.5, after=2000)
+    assert output_file == str(tmp_path / 'a.ttml')
+    assert file_name.read_text(encoding='utf-8') == DIA_XML
+    assert timings(output_file) == [(1000, 2000), (4500, 5500)]
+    assert not list(tmp_path.glob('*.part'))
+
+
+def test_shift_ttml_in_place(tmp_path, capsys):
+    file_name = tmp_path / 'a.ttml'
+    file_name.write_text(TTML, encoding='utf-8')
+    assert subtitle_tool.shift_subtitle(str(file_name), -0.5) == str(file_name)
+    assert timings(file_name) == [(500, 1500), (2500, 3500)]
+    assert 'a.ttml\t平移 2 行' in capsys.readouterr().out
+
+
+SRT = '''1
+00:00:01,000 --> 00:00:02,000
+你好
+
+2
+00:00:06,000 --> 00:00:10,000
+世界
+'''
+
+
+def test_fps_retime_srt_keeps_other_bytes(tmp_path):
+    file_name = tmp_path / 'a.srt'
+    file_name.write_text(SRT, encoding='utf-8')
+    retime_map = subtitle_tool.fps_retime(subtitle_tool.parse_framerate('23.976'),
+                                          subtitle_tool.parse_framerate('25'))
+    subtitle_tool.retime_subtitle(str(file_name), retime_map)
+    assert file_name.read_text(encoding='utf-8') == SRT.replace(
+        '00:00:01,000 --> 00:00:02,000', '00:00:00,959 --> 00:00:01,918').replace(
+        '00:00:06,000 --> 00:00:10,000', '00:00:05,754 --> 00:00:09,590')
+
+
+def test_offset_retime_moves_events_by_start(monkeypatch):
+    retime_map = subtitle_tool.piecewise_retime([(5000, -500), (0, 1000)])
+    starts, ends = subtitle_tool.array('i', [1000, 4000, 6000]), subtitle_tool.array('i', [2000, 5500, 7000])
+    expected = ([2000, 5000, 5500], [3000, 6500, 6500])
+    assert tuple(map(list, subtitle_tool.retime_columns(starts, ends, retime_map))) == expected
+    monkeypatch.setattr(subtitle_tool, 'np', None)
+    assert tuple(map(list, subtitle_tool.retime_columns(starts, ends, retime_map))) == expected
+
+
+def test_retime_xml_keeps_source(tmp_path):
+    file_name = tmp_path / 'a.xml'
+    file_name.write_text(DIA_XML, encoding='utf-8')
+    output_file = subtitle_tool.retime_subtitle(str(file_name), subtitle_tool.piecewise_retime([(2000, 1000)]))
+    assert output_file == str(tmp_path / 'a.ttml')
+    assert file_name.read_text(encoding='utf-8') == DIA_XML
+    assert timings(output_file) == [(1000, 2000), (4000, 5000)]
@@ -0,0 +1,94 @@
+"""
+Native srt parser and serializer must match pysubs2
+"""
+import pysubs2
+import pytest
+
+import subtitle_tool
+
+SRT_CASES = {
+    'plain': '1\n00:00:01,000 --> 00:00:02,000\n你好\n\n2\n00:00:03,000 --> 00:00:04,500\n世界\n',
+    'blank event': '1\n00:00:01,000 --> 00:00:02,000\n\n2\n00:00:03,000 --> 00:00:04,000\ntext\n',
+    'blank last event': '1\n00:00:01,000 --> 00:00:02,000\ntext\n\n2\n00:00:03,000 --> 00:00:04,000\n',
+    'next index': '1\n00:00:01,000 --> 00:00:02,000\nline one\nline two\n\n\n 2 \n00:00:03,000 --> 00:00:04,000\nx\n',
+    'html tags': '1\n00:00:01,000 --> 00:00:02,000\n<i>ita</i> < b >bold</b> <font color="red">red</font>\n',
+    'short fractions': '1\n00:00:01,5 --> 00:00:02,25\na\n\n2\n0:1:2.125 --> 0:1:3.9\nb\n',
+    'an8': '1\n00:00:01,000 --> 00:00:02,000\n{\\an8}上方\n',
+    'no trailing newline': '1\n00:00:01,000 --> 00:00:02,000\nlast',
+    'spaces around timing': '1\n  00:00:01,000   -->  00:00:02,000  \ntext\n',
+    'unsorted': '1\n00:00:05,000 --> 00:00:06,000\nb\n\n2\n00:00:01,000 --> 00:00:02,000\na\n',
+}
+
+FALLBACK_CASES = {
+    'CR line endings': '1\r\n00:00:01,000 --> 00:00:02,000\r\ntext\r\n\r\n2\r\n00:00:03,000 --> 00:00:04,000\r\nx\r\n',
+    'extra timing text': '1\n00:00:01,000 --> 00:00:02,000 X1:10\ntext\n',
+    'timestamp in text': '1\n00:00:01,000 --> 00:00:02,000\nat 00:00:05,000 --> here\n',
+    'non-ASCII digits': '1\n００:００:01,000 --> 00:00:02,000\ntext\n',
+}
+
+
+def pysubs2_fields(text, format_=None):
+    return [(sub.start, sub.end, sub.text) for sub in pysubs2.SSAFile.from_string(text, format_=format_).events]
+
+
+@pytest.mark.parametrize('text', SRT_CASES.values(), ids=SRT_CASES.keys())
+def test_parse_matches_pysubs2(text, monkeypatch):
+    monkeypatch.setattr(subtitle_tool, 'parse_srt_fallback', pytest.fail)
+    assert subtitle_tool.parse_srt_fields(text) == pysubs2_fields(text)
+
+
+@pytest.mark.parametrize('text', FALLBACK_CASES.values(), ids=FALLBACK_CASES.keys())
+def test_parse_falls_back(text, monkeypatch):
+    calls = []
+    fallback = subtitle_tool.parse_srt_fallback
+    monkeypatch.setattr(subtitle_tool, 'parse_srt_fallback',
+                        lambda *args: calls.append(args) or fallback(*args))
+    assert subtitle_tool.parse_srt_fields(text) == pysubs2_fields(text, 'srt')
+    assert calls
+
+
+def test_parse_falls_back_when_not_srt(monkeypatch):
+    text = 'WEBVTT\n\n00:01.000 --> 00:02.000\ntext\n'
+    calls = []
+    monkeypatch.setattr(subtitle_tool, 'parse_srt_fallback',
+                        lambda *args: calls.append(args) or [])
+    subtitle_tool.parse_srt_fields(text)
+    assert calls == [(text, None)]
+
+
+@pytest.mark.parametrize('text', SRT_CASES.values(), ids=SRT_CASES.keys())
+def test_dump_matches_pysubs2(text):
+    subs = pysubs2.SSAFile.from_string(text)
+    assert subtitle_tool.dump_srt_events(subs.events) == subs.to_string('srt')
+
+
+@pytest.mark.parametrize('text', [
+    '{\\i1}ita{\\i0} {\\u1}under{\\u0} {\\s1}strike',
+    '{\\an8}{\\i1}top',
+    '{\\i1}a{\\r}b{\\rDefault}c',
+    'a\\Nb\\n\\hc',
+    'a\\N\\N\\Nb',
+    '{\\p1}m 0 0 l 10 10{\\p0}',
+    '  padded  ',
+], ids=['styles', 'an8 italic', 'reset', 'newlines', 'blank lines', 'drawing', 'padded'])
+def test_dump_tags_match_pysubs2(text):
+    subs = pysubs2.SSAFile()
+    subs.append(pysubs2.SSAEvent(start=1000, end=2000, text=text))
+    subs.append(pysubs2.SSAEvent(start=3000, end=4000, text='next'))
+    subs.append(pysubs2.SSAEvent(start=5000, end=6000, text='comment', type='Comment'))
+    assert subtitle_tool.dump_srt_events(subs.events) == subs.to_string('srt')
+
+
+def test_dump_styled_file_falls_back_to_pysubs2():
+    subs = pysubs2.SSAFile()
+    subs.styles['Italic'] = pysubs2.SSAStyle(italic=True)
+    subs.append(pysubs2.SSAEvent(start=1000, end=2000, text='plain'))
+    subs.append(pysubs2.SSAEvent(start=3000, end=4000, text='styled', style='Italic'))
+    assert subtitle_tool.dump_srt_events(subs.events, subs.styles) == subs.to_string('srt')
+    assert '<i>styled</i>' in subtitle_tool.dump_srt_events(subs.events, subs.styles)
+
+
+@pytest.mark.filterwarnings('ignore:Overflow in SubRip timestamp')
+@pytest.mark.parametrize('ms', [0, 1, 999, 61001, 3599999, 36000000, pysubs2.subrip.MAX_REPRESENTABLE_TIME + 1, -5])
+def test_ms_to_srt_time_matches_pysubs2(ms):
+    assert subtitle_tool.ms_to_srt_time(ms) == pysubs2.subrip.SubripFormat.ms_to_timestamp(ms)
@@ -0,0 +1,68 @@
+"""
+FFT offset and framerate drift search of auto sync
+"""
+import random
+
+import pytest
+
+import subtitle_tool
+
+pytest.importorskip('numpy')
+
+
+def make_reference(count=400, seed=1):
+    rng = random.Random(seed)
+    starts, ends, texts = [], [], []
+    time = 5000
+    for index in range(count):
+        time += rng.randint(300, 4000)
+        length = rng.randint(800, 4000)
+        starts.append(time)
+        ends.append(time + length)
+        texts.append(str(index))
+        time += length
+    return subtitle_tool.SubtitleTrack(starts, ends, texts)
+
+
+def make_target(reference, scale, offset):
+    # reference = target * scale + offset
+    return subtitle_tool.SubtitleTrack([round((start - offset) / scale) for start in reference.starts],
+                                       [round((end - offset) / scale) for end in reference.ends],
+                                       reference.texts)
+
+
+def test_find_offset():
+    reference = make_reference()
+    [(start, scale, offset)], ratio = subtitle_tool.find_sync(reference, make_target(reference, 1.0, 3500))
+    assert (start, scale) == (0, 1.0)
+    assert offset == pytest.approx(3500, abs=subtitle_tool.SYNC_RESOLUTION)
+    assert ratio > 0.95
+
+
+def test_find_drift_and_offset():
+    reference = make_reference()
+    drift = subtitle_tool.parse_framerate('23.976') / subtitle_tool.parse_framerate('25')
+    assert drift == pytest.approx(0.959, abs=1e-3)
+    target = make_target(reference, drift, -2240)
+
+    [(_, scale, offset)], ratio = subtitle_tool.find_sync(reference, target, drift=True)
+    assert scale == pytest.approx(drift)
+    assert offset == pytest.approx(-2240, abs=subtitle_tool.SYNC_RESOLUTION)
+    assert ratio > 0.95
+
+    # 不找漂移時對不上
+    _, ratio = subtitle_tool.find_sync(reference, target)
+    assert ratio < 0.8
+
+
+def test_auto_sync_subtitle_retimes_file(tmp_path):
+    reference = make_reference(200)
+    drift = subtitle_tool.parse_framerate('25') / subtitle_tool.parse_framerate('24')
+    target = make_target(reference, drift, 1200)
+    (tmp_path / 'reference.srt').write_text(subtitle_tool.dump_srt_events(reference), encoding='utf-8')
+    (tmp_path / 'target.srt').write_text(subtitle_tool.dump_srt_events(target), encoding='utf-8')
+
+    subtitle_tool.auto_sync_subtitle(str(tmp_path / 'target.srt'), str(tmp_path / 'reference.srt'), drift=True)
+    synced = subtitle_tool.SubtitleTrack.load(str(tmp_path / 'target.srt'))
+    assert list(synced.texts) == list(reference.texts)
+    assert max(abs(a - b) for a, b in zip(synced.starts, reference.starts)) <= 2 * subtitle_tool.SYNC_RESOLUTION
@@ -0,0 +1,48 @@
+"""
+Indexing of compact subtitle tracks and their interval index
+"""
+import random
+
+import pytest
+
+import subtitle_tool
+
+
+def test_slice_returns_track():
+    track = subtitle_tool.SubtitleTrack([1000, 3000, 5000], [2000, 4000, 6000], ['a', 'b', 'c'])
+    part = track[1:]
+    assert isinstance(part, subtitle_tool.SubtitleTrack)
+    assert [(sub.start, sub.end, sub.text) for sub in part] == [(3000, 4000, 'b'), (5000, 6000, 'c')]
+    part.starts[0] = 0
+    assert list(track.starts) == [1000, 3000, 5000]
+    assert [sub.text for sub in track[::-2]] == ['c', 'a']
+
+
+def test_index_returns_event():
+    track = subtitle_tool.SubtitleTrack([1000, 3000], [2000, 4000], ['a', 'b'])
+    assert track[-1].text == 'b'
+    with pytest.raises(IndexError):
+        track[2]
+
+
+def brute_force_overlap(track, start, end):
+    order = sorted(range(len(track)), key=lambda i: (track.starts[i], track.ends[i]))
+    return [i for i in order if track.starts[i] < end and track.ends[i] > start]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_interval_index_matches_brute_force(seed):
+    rng = random.Random(seed)
+    events = []
+    for _ in range(rng.randint(0, 300)):
+        start = rng.randint(0, 60000)
+        # 偶爾出現整段長度或零長度的字幕
+        length = rng.choice([0, rng.randint(1, 3000), rng.randint(1, 60000)])
+        events.append((start, start + length, 'x'))
+    track = subtitle_tool.SubtitleTrack.from_fields(events)
+    index = track.index()
+    for _ in range(200):
+        start = rng.randint(-1000, 62000)
+        end = start + rng.choice([1, rng.randint(1, 5000)])
+        assert index.overlap(start, end) == brute_force_overlap(track, start, end)
+        assert index.at(start) == brute_force_overlap(track, start, start + 1)
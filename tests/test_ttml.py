@@ -0,0 +1,25 @@
+"""
+Regions of ttml events
+"""
+import subtitle_tool
+
+TTML = '''<?xml version="1.0" encoding="UTF-8"?>
+<tt xmlns="http://www.w3.org/ns/ttml" xmlns:tts="http://www.w3.org/ns/ttml#styling">
+<head><layout>
+<region tts:origin="10% 10%" tts:extent="80% 10%"/>
+<region xml:id="top" tts:origin="10% 5%" tts:extent="80% 10%"/>
+<region xml:id="bottom" tts:origin="10% 80%" tts:extent="80% 10%"/>
+</layout></head>
+<body><div>
+<p begin="00:00:01.000" end="00:00:02.000">no region</p>
+<p begin="00:00:03.000" end="00:00:04.000" region="top">top line</p>
+<p begin="00:00:05.000" end="00:00:06.000" region="bottom">bottom line</p>
+</div></body></tt>
+'''
+
+
+def test_top_region_without_id_is_ignored(tmp_path):
+    file_name = tmp_path / 'regions.ttml'
+    file_name.write_text(TTML, encoding='utf-8')
+    assert [sub.text for sub in subtitle_tool.read_ttml(str(file_name))] == \
+        ['no region', '{\\an8}top line', 'bottom line']
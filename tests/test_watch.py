@@ -0,0 +1,32 @@
+"""
+Watched directories are rescanned once per poll
+"""
+import os
+import sys
+
+import subtitle_tool
+
+SRT = '1\n00:00:01,000 --> 00:00:02,000\n你好\n'
+
+
+def test_watch_handles_ready_files_in_one_poll(tmp_path, monkeypatch):
+    for index in range(3):
+        file_name = tmp_path / f'{index}.srt'
+        file_name.write_text(SRT, encoding='utf-8')
+        os.utime(file_name, (0, 0))
+
+    scans = []
+    scan_dir = subtitle_tool.scan_dir
+    monkeypatch.setattr(subtitle_tool, 'scan_dir', lambda *args: scans.append(args) or scan_dir(*args))
+    sleeps = []
+
+    def sleep(_):
+        sleeps.append(len(scans))
+        if len(sleeps) == 2:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(subtitle_tool.time, 'sleep', sleep)
+    monkeypatch.setattr(sys, 'argv', ['subtitle_tool.py', '--watch', '1', str(tmp_path)])
+    subtitle_tool.main()
+    assert sleeps == [1, 2]
+    assert sorted(path.name for path in tmp_path.glob('*.srt')) == ['0.zh.srt', '1.zh.srt', '2.zh.srt']
@@ -0,0 +1,57 @@
+"""
+write_zip writes sorted, reproducible archives
+"""
+import sys
+import zipfile
+
+import pytest
+
+import subtitle_tool
+
+
+def test_write_zip_passes_testzip(tmp_path):
+    entries = [('b.srt', '1\n00:00:01,000 --> 00:00:02,000\n你好\n\n'.encode('utf-8')),
+               ('a.srt', b''),
+               ('季/第一集.srt', 'x'.encode('utf-8') * 100000)]
+    file_name = str(tmp_path / 'subtitles.zip')
+    subtitle_tool.write_zip(file_name, entries)
+
+    with zipfile.ZipFile(file_name) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == ['a.srt', 'b.srt', '季/第一集.srt']
+        for name, data in entries:
+            assert archive.read(name) == data
+            assert archive.getinfo(name).date_time == subtitle_tool.ZIP_DATE_TIME
+
+
+def test_write_zip_is_reproducible(tmp_path):
+    entries = [('a.srt', b'a' * 1000), ('b.srt', b'b')]
+    subtitle_tool.write_zip(str(tmp_path / 'first.zip'), entries)
+    subtitle_tool.write_zip(str(tmp_path / 'second.zip'), list(reversed(entries)))
+    assert (tmp_path / 'first.zip').read_bytes() == (tmp_path / 'second.zip').read_bytes()
+
+
+def test_write_empty_zip(tmp_path):
+    file_name = str(tmp_path / 'empty.zip')
+    subtitle_tool.write_zip(file_name, [])
+    with zipfile.ZipFile(file_name) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == []
+
+
+@pytest.mark.parametrize('jobs', [[], ['-j', '2'], ['-j', '2', '--async', '1']], ids=['serial', 'jobs', 'async'])
+def test_zip_directory_from_memory(tmp_path, monkeypatch, jobs):
+    folder = tmp_path / 'show'
+    folder.mkdir()
+    for index in range(3):
+        (folder / f'show.S01E0{index + 1}.chs.srt').write_text(
+            '1\n00:00:01,000 --> 00:00:02,000\n你好\n', encoding='utf-8')
+    monkeypatch.setattr(subtitle_tool, 'read_srt_outputs',
+                        lambda output_files: pytest.fail('read back ' + str(output_files)) if output_files else [])
+    monkeypatch.setattr(sys, 'argv', ['subtitle_tool.py', *jobs, '--zip', 'nf', str(folder)])
+    subtitle_tool.main()
+
+    with zipfile.ZipFile(str(folder) + '.WEB-DL.Netflix.zh-Hant.zip') as archive:
+        assert archive.namelist() == [f'show.S01E0{index + 1}.zh.srt' for index in range(3)]
+        for name in archive.namelist():
+            assert archive.read(name) == (folder / name).read_bytes()